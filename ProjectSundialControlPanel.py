@@ -1,6 +1,27 @@
+import time
+START_TIME = time.perf_counter()  # Taken before the Qt import, for the startup report
+import os
 import sys
-import paramiko
+import json
+import queue
 from PyQt5 import QtWidgets, QtGui, QtCore
+from log_panel import LogPanel
+from metrics_panel import MetricsDialog
+IMPORT_TIME = time.perf_counter()
+
+RIGS_FILE = os.path.join(os.path.expanduser("~"), "ProjectSundialRigs.json")
+RIG_FIELDS = ["name", "host", "gear_ratio", "steps_per_rotation", "total_ics"]
+RIG_COLUMNS = ["Use", "Name", "IP Address", "Gear Ratio", "Steps per Rotation", "Total ICs", "Queued Jogs", "Status"]
+MAX_WORKERS = 32  # Every rig may have a command, a stop request and a held jog's rate updates in flight
+JOG_WINDOW_MS = 300  # Step clicks this close together are sent as one move
+JOG_COMMANDS = {1: "step_forward", -1: "step_backward"}
+JOG_KEEPALIVE_MS = 150  # Rate updates while a jog is held (the Pi stops after 500 ms without one)
+JOG_KEYS = {  # Held keys that jog, as (axis, direction)
+    QtCore.Qt.Key_Right: ("pcb", 0),
+    QtCore.Qt.Key_Left: ("pcb", 1),
+    QtCore.Qt.Key_Up: ("actuator", 1),
+    QtCore.Qt.Key_Down: ("actuator", 0),
+}
 
 
 def get_input_value(input_field):
@@ -16,12 +37,382 @@ def get_input_value(input_field):
         return None
 
 
+def process_age():
+    """
+    Seconds since the process was created, so the startup report includes
+    interpreter start and bundle unpacking. None where that is not available.
+    """
+    try:
+        if sys.platform.startswith("linux"):
+            with open("/proc/self/stat") as stat_file:
+                # Field 22 (start time in clock ticks since boot), after the ")" ending the name
+                start_ticks = int(stat_file.read().rsplit(")", 1)[1].split()[19])
+            with open("/proc/uptime") as uptime_file:
+                uptime = float(uptime_file.read().split()[0])
+            return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+        if sys.platform == "win32":
+            import ctypes
+            created, exited, kernel, user, now = (ctypes.c_ulonglong() for _ in range(5))
+            kernel32 = ctypes.windll.kernel32
+            kernel32.GetProcessTimes(kernel32.GetCurrentProcess(), ctypes.byref(created),
+                                     ctypes.byref(exited), ctypes.byref(kernel), ctypes.byref(user))
+            kernel32.GetSystemTimeAsFileTime(ctypes.byref(now))
+            return (now.value - created.value) / 1e7  # FILETIMEs count 100 ns units
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    return None
+
+
+def remote_connection_class():
+    # paramiko and the cryptography stack behind it take a good part of a
+    # second to import, so they are loaded once the window is up
+    from ssh_connection import RemoteConnection
+    return RemoteConnection
+
+
+def preload_ssh(report):
+    start = time.perf_counter()
+    remote_connection_class()
+    return time.perf_counter() - start
+
+
+def load_rigs():
+    try:
+        with open(RIGS_FILE) as rigs_file:
+            return json.load(rigs_file)
+    except (OSError, ValueError):
+        return [{"name": "Rig 1", "host": "", "gear_ratio": "", "steps_per_rotation": "", "total_ics": ""}]
+
+
+def save_rigs(rigs):
+    try:
+        with open(RIGS_FILE, "w") as rigs_file:
+            json.dump([rig.settings() for rig in rigs], rigs_file, indent=4)
+    except OSError:
+        pass  # The list is only a convenience, the panel works without it
+
+
+class JogQueue:
+    """
+    Step Forward / Step Backward clicks waiting to be sent to one rig. A click
+    in the same direction as the last queued entry adds to it, so a burst of
+    clicks becomes one N-step move. The queue is sent once no click has come
+    for JOG_WINDOW_MS and the rig is idle; clicks that arrive while a move is
+    running keep merging into the next one.
+    """
+
+    def __init__(self, rig):
+        self.rig = rig
+        self.pending = []  # [direction, steps], oldest first
+        self.timer = QtCore.QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.send_next)
+
+    @property
+    def depth(self):
+        return sum(steps for _, steps in self.pending)
+
+    def text(self):
+        return " ".join(f"{direction * steps:+d}" for direction, steps in self.pending)
+
+    def add(self, direction):
+        if self.pending and self.pending[-1][0] == direction:
+            self.pending[-1][1] += 1
+        else:
+            self.pending.append([direction, 1])
+        self.timer.start(JOG_WINDOW_MS)  # Restarted by every click of a burst
+        self.rig.app.jogs_changed(self.rig)
+
+    def cancel(self):
+        self.timer.stop()
+        cancelled = self.depth
+        self.pending = []
+        self.rig.app.jogs_changed(self.rig)
+        return cancelled
+
+    def rig_idle(self):
+        if self.pending and not self.timer.isActive():
+            self.timer.start(JOG_WINDOW_MS)
+
+    def send_next(self):
+        # Sent again from rig_idle once the running operation has finished
+        if not self.pending or self.rig.busy:
+            return
+        direction, steps = self.pending[0]
+        if self.rig.execute_remote_command(JOG_COMMANDS[direction], steps):
+            self.pending.pop(0)
+        else:
+            self.cancel()  # Not connected or a field is missing, already logged
+        self.rig.app.jogs_changed(self.rig)
+
+
+class RigController:
+    """
+    One Sundial rig: its parameters, its connection and the operation running
+    on it. Every rig has its own busy flag, so commands on different rigs run
+    in parallel on the shared thread pool.
+    """
+
+    def __init__(self, app, settings):
+        self.app = app
+        self.values = {field: str(settings.get(field, "")) for field in RIG_FIELDS}
+        self.connection = None
+        self.busy = False
+        self.status = "Idle"
+        self.idle_status = "Idle"
+        self.active_worker = None
+        self.stop_worker = None
+        self.metrics_worker = None
+        self.metrics_dialog = None
+        self.jogs = JogQueue(self)
+        self.jog_press = None  # Identifies the held jog to the Pi
+        self.jog_rates = None  # Rates for the worker that sends them during the hold
+        self.jog_worker = None
+        self.jog_timer = QtCore.QTimer()
+        self.jog_timer.timeout.connect(lambda: self.send_jog_rate(self.app.jog_rate()))
+
+    @property
+    def name(self):
+        return self.values["name"] or self.values["host"] or "Rig"
+
+    @property
+    def total_ics(self):
+        return self.number("total_ics")
+
+    def settings(self):
+        return dict(self.values)
+
+    def number(self, field):
+        try:
+            return float(self.values[field])
+        except ValueError:
+            return None
+
+    def log(self, message, level=None):
+        self.app.log_message(message, level, self.name)
+
+    def set_status(self, status):
+        self.status = status
+        self.app.rig_status_changed(self)
+
+    def run_in_background(self, description, function, *args, on_result=None, on_error=None):
+        """
+        Runs a blocking remote operation on the thread pool so the window stays
+        responsive. Only one operation runs at a time per rig; clicks that
+        arrive while its motors are busy are rejected.
+        """
+        if self.busy:
+            self.log(f"Busy, ignoring {description}. Please wait for the current operation to finish.", "Warning")
+            return False
+        self.busy = True
+        self.idle_status = self.status
+        self.set_status(f"Running {description}")
+
+        worker = RemoteWorker(function, *args)
+        worker.signals.progress.connect(self.log)
+        # worker_done must run first so the callbacks can start the next operation
+        worker.signals.result.connect(self.worker_done)
+        worker.signals.error.connect(self.worker_done)
+        if on_result is not None:
+            worker.signals.result.connect(on_result)
+        worker.signals.error.connect(on_error if on_error is not None else self.log)
+        self.active_worker = worker
+        self.app.thread_pool.start(worker)
+        return True
+
+    def worker_done(self, *_):
+        self.busy = False
+        self.active_worker = None
+        self.set_status(self.idle_status)
+        self.jogs.rig_idle()
+
+    def jog(self, direction):
+        if self.connection is None:
+            self.log("Not connected to Raspberry Pi. Please connect first.")
+            return
+        self.jogs.add(direction)
+
+    def start_jog(self, axis, direction, rate):
+        """
+        Starts a continuous jog that runs until stop_jog. While it runs the
+        rate is sent again every JOG_KEEPALIVE_MS, so speed changes apply at
+        once and the Pi stops by itself if the panel goes away.
+        """
+        if not self.has_motion_server():
+            self.log("Jogging needs the motion server. Please connect first.")
+            return
+        press = int(time.time() * 1000)
+        if self.execute_remote_command("jog", axis, direction, press, rate):
+            self.jog_press = press
+            self.jog_rates = queue.Queue()
+            worker = RemoteWorker(self.stream_jog_rates, press, self.jog_rates)
+            worker.signals.error.connect(lambda error: self.log(f"Error sending jog rate: {error}"))
+            self.jog_worker = worker
+            self.app.thread_pool.start(worker)
+            self.jog_timer.start(JOG_KEEPALIVE_MS)
+
+    def stop_jog(self):
+        if self.jog_press is None:
+            return
+        self.jog_timer.stop()
+        self.send_jog_rate(0)
+        self.jog_press = None
+
+    def send_jog_rate(self, rate):
+        self.jog_rates.put(rate)
+
+    def stream_jog_rates(self, report, press, rates):
+        # Runs for the whole hold and sends the rates as queries (they get
+        # through while the jog command holds the rig) on one channel, which
+        # is closed once the rate of 0 is out
+        channel = self.connection.query_channel()
+        try:
+            while True:
+                rate = rates.get()
+                while not rates.empty():
+                    rate = rates.get_nowait()  # Only the latest rate matters
+                channel.send(f"jog_rate {press} {rate}")
+                if rate == 0:
+                    return
+        finally:
+            channel.close()
+
+    def cancel_jogs(self):
+        cancelled = self.jogs.cancel()
+        if cancelled:
+            self.log(f"Cancelled {cancelled} queued jog steps")
+
+    def connect(self):
+        hostname = self.values["host"].strip()
+        if not hostname:
+            self.log("Please enter a valid IP address.")
+            return
+        self.run_in_background(
+            "connect", self.open_connection, hostname,
+            on_result=self.connection_opened, on_error=self.connection_failed
+        )
+
+    def open_connection(self, report, hostname):
+        if self.connection is not None:
+            self.connection.close()
+        self.connection = remote_connection_class()(hostname)
+        self.connection.connect(report)
+
+    def connection_opened(self, _):
+        self.set_status("Connected")
+        self.execute_remote_command("connect_to_device")
+
+    def connection_failed(self, error):
+        self.log(f"Error connecting to Raspberry Pi: {error}")
+        self.set_status("Error")
+
+    def has_motion_server(self):
+        return self.connection is not None and self.connection.has_motion_server()
+
+    def stop_campaign(self):
+        # Runs outside run_in_background on purpose, it has to get through while busy
+        if not self.has_motion_server():
+            self.log("No campaign is running.")
+            return
+        worker = RemoteWorker(self.send_stop)
+        worker.signals.progress.connect(self.log)
+        worker.signals.error.connect(self.log)
+        self.stop_worker = worker
+        self.app.thread_pool.start(worker)
+
+    def send_stop(self, report):
+        self.connection.send_query("stop")
+        report("Stop requested, the campaign or trigger mode ends after the current device.")
+
+    def show_metrics(self):
+        if not self.has_motion_server():
+            self.log("Metrics need the motion server. Please connect first.")
+            return
+        if self.metrics_dialog is None:
+            self.metrics_dialog = MetricsDialog(self.name, self.fetch_metrics, self.app)
+        self.metrics_dialog.show()
+        self.metrics_dialog.raise_()
+        self.fetch_metrics()
+
+    def fetch_metrics(self):
+        # A query, so like stop_campaign it does not wait for the rig to be idle
+        worker = RemoteWorker(lambda report: "\n".join(self.connection.send_query("metrics")))
+        worker.signals.result.connect(self.metrics_dialog.set_metrics)
+        worker.signals.error.connect(lambda error: self.log(f"Error reading metrics: {error}"))
+        self.metrics_worker = worker
+        self.app.thread_pool.start(worker)
+
+    def disconnect(self):
+        if self.connection is not None and self.connection.is_active():
+            arguments = self.compute_arguments(())
+            self.run_in_background(
+                "disconnect", self.close_connection, arguments,
+                on_result=self.connection_closed
+            )
+        else:
+            self.log("No active connection to disconnect.")
+
+    def close_connection(self, report, arguments):
+        if arguments is not None:
+            self.connection.run_command(report, "disconnect_from_device", *arguments)
+        self.connection.close()
+        report("Disconnected from Raspberry Pi")
+
+    def connection_closed(self, _):
+        self.jogs.cancel()
+        self.connection = None
+        self.set_status("Disconnected")
+
+    def compute_arguments(self, extra_args):
+        """
+        Reads the rig parameters and returns (computed_value, argument string)
+        for a remote command, or None if a field is missing.
+        """
+        gear_ratio = self.number("gear_ratio")
+        steps_per_rotation = self.number("steps_per_rotation")
+        total_ics = self.total_ics
+
+        if gear_ratio is None or steps_per_rotation is None or total_ics is None:
+            self.log("Please fill in all fields: Gear Ratio, Steps per Rotation, and Total ICs.")
+            return None
+
+        if total_ics == 0:
+            self.log("Total ICs cannot be zero.")
+            return None
+
+        computed_value = (gear_ratio * steps_per_rotation) / total_ics
+        arguments = " ".join(str(arg) for arg in (computed_value,) + tuple(extra_args))
+        return computed_value, arguments
+
+    def execute_remote_command(self, file_name, *extra_args):
+        # A dropped link is repaired by the connection itself before the command runs
+        if self.connection is None:
+            self.log("Not connected to Raspberry Pi. Please connect first.")
+            return False
+        arguments = self.compute_arguments(extra_args)
+        if arguments is None:
+            return False
+        return self.run_in_background(
+            file_name, self.connection.run_command, file_name, *arguments,
+            on_error=lambda error: self.log(f"Error executing : {error}")
+        )
+
+
 class DeviceControlApp(QtWidgets.QWidget):
     def __init__(self):
         super().__init__()
-        self.log_text = None
-        self.ssh_client = None
+        self.log_panel = None
+        self.thread_pool = QtCore.QThreadPool()
+        self.thread_pool.setMaxThreadCount(MAX_WORKERS)
+        self.rigs = []
+        self.preload_worker = None
+        self.jog_key = None  # Arrow key holding the current jog
         self.init_ui()
+        for settings in load_rigs():
+            self.add_rig(settings)
+        # Key events go to the focused widget (table, slider, buttons), which
+        # would use the arrow keys itself, so they are caught for the whole app
+        QtWidgets.QApplication.instance().installEventFilter(self)
 
     def init_ui(self):
         self.setWindowTitle("Project Sundial Control Panel")
@@ -37,46 +428,97 @@ class DeviceControlApp(QtWidgets.QWidget):
         self.status_label.setAlignment(QtCore.Qt.AlignCenter)
         control_panel.addWidget(self.status_label)
 
+        # Rigs Group: one row per rig, commands go to every ticked rig
+        rigs_group = QtWidgets.QGroupBox("Rigs")
+        rigs_group.setStyleSheet(
+            "QGroupBox { font-size: 16px; font-weight: bold; padding: 10px; border: 2px solid #008080; border-radius: 5px; }"
+        )
+        rigs_layout = QtWidgets.QVBoxLayout()
+        self.rig_table = QtWidgets.QTableWidget(0, len(RIG_COLUMNS))
+        self.rig_table.setHorizontalHeaderLabels(RIG_COLUMNS)
+        self.rig_table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
+        self.rig_table.verticalHeader().setVisible(False)
+        self.rig_table.setStyleSheet("font-size: 16px;")
+        self.rig_table.itemChanged.connect(self.rig_item_changed)
+        rigs_layout.addWidget(self.rig_table)
+        rig_buttons = QtWidgets.QHBoxLayout()
+        rig_buttons.addWidget(self.create_button("Add Rig", "#008080", lambda: self.add_rig({})))  # Teal
+        rig_buttons.addWidget(self.create_button("Remove Rig", "#B22222", self.remove_rig))  # Deep Red
+        rigs_layout.addLayout(rig_buttons)
+        rigs_group.setLayout(rigs_layout)
+        control_panel.addWidget(rigs_group)
+
         # Parameters Input Group
         parameters_group = QtWidgets.QGroupBox("Device Parameters")
         parameters_group.setStyleSheet(
             "QGroupBox { font-size: 16px; font-weight: bold; padding: 10px; border: 2px solid #008080; border-radius: 5px; }"
         )
         parameters_layout = QtWidgets.QFormLayout()
-        self.total_ics_input = self.create_input_field("Total ICs", parameters_layout)
-        self.gear_ratio_input = self.create_input_field("Gear Ratio", parameters_layout)
-        self.steps_per_rotation_input = self.create_input_field("Steps per Rotation", parameters_layout)
-        self.ip_address_input = self.create_input_field("Raspberry Pi IP Address", parameters_layout)
+        self.goto_device_input = self.create_input_field("Go To Device", parameters_layout)
+        self.set_device_input = self.create_input_field("Set Device", parameters_layout)
         parameters_group.setLayout(parameters_layout)
         control_panel.addWidget(parameters_group)
 
+        # Campaign Input Group
+        campaign_group = QtWidgets.QGroupBox("Test Campaign")
+        campaign_group.setStyleSheet(
+            "QGroupBox { font-size: 16px; font-weight: bold; padding: 10px; border: 2px solid #008080; border-radius: 5px; }"
+        )
+        campaign_layout = QtWidgets.QFormLayout()
+        self.first_device_input = self.create_input_field("First Device", campaign_layout)
+        self.last_device_input = self.create_input_field("Last Device", campaign_layout)
+        self.dwell_time_input = self.create_input_field("Dwell Time (s)", campaign_layout)
+        self.home_every_input = self.create_input_field("Re-home Every (devices)", campaign_layout)
+        campaign_group.setLayout(campaign_layout)
+        control_panel.addWidget(campaign_group)
+
+        # Jog Group: moves while a button (or arrow key) is held
+        jog_group = QtWidgets.QGroupBox("Jog (hold, or hold the arrow keys)")
+        jog_group.setStyleSheet(
+            "QGroupBox { font-size: 16px; font-weight: bold; padding: 10px; border: 2px solid #008080; border-radius: 5px; }"
+        )
+        jog_layout = QtWidgets.QGridLayout()
+        jog_layout.addWidget(self.create_hold_button("PCB Backward", "#00BFFF", "pcb", 1), 0, 0)  # Sky Blue
+        jog_layout.addWidget(self.create_hold_button("PCB Forward", "#00BFFF", "pcb", 0), 0, 1)  # Sky Blue
+        jog_layout.addWidget(self.create_hold_button("Actuator Retract", "#FFA500", "actuator", 1), 1, 0)  # Light Orange
+        jog_layout.addWidget(self.create_hold_button("Actuator Extend", "#FFA500", "actuator", 0), 1, 1)  # Light Orange
+        speed_label = QtWidgets.QLabel("Jog Speed")
+        speed_label.setFont(QtGui.QFont("Arial", 16))
+        jog_layout.addWidget(speed_label, 2, 0)
+        self.jog_speed_slider = QtWidgets.QSlider(QtCore.Qt.Horizontal)
+        self.jog_speed_slider.setRange(5, 100)  # Percent of the axis max velocity
+        self.jog_speed_slider.setValue(50)
+        jog_layout.addWidget(self.jog_speed_slider, 2, 1)
+        jog_group.setLayout(jog_layout)
+        control_panel.addWidget(jog_group)
+
         # Buttons
         button_layout = QtWidgets.QVBoxLayout()
         button_layout.addWidget(self.create_button("Connect To Device", "#008080", self.connect_to_pi))  # Teal
         button_layout.addWidget(self.create_button("Step Forward", "#00BFFF", self.step_forward))  # Sky Blue
         button_layout.addWidget(self.create_button("Step Backward", "#00BFFF", self.step_backward))  # Sky Blue
+        button_layout.addWidget(self.create_button("Cancel Queued Jogs", "#B22222", self.cancel_jogs))  # Deep Red
         button_layout.addWidget(self.create_button("Test Connection", "#FFA500", self.test_connection))  # Light Orange
         button_layout.addWidget(self.create_button("Test First Device", "#FFA500", self.test_first_device))  # Light Orange
+        button_layout.addWidget(self.create_button("Home Axes", "#FFA500", self.home_axes))  # Light Orange
         button_layout.addWidget(self.create_button("Next Device", "#9370DB", self.next_device))  # Soft Purple
         button_layout.addWidget(self.create_button("Previous Device", "#9370DB", self.previous_device))  # Soft Purple
+        button_layout.addWidget(self.create_button("Go To Device", "#9370DB", self.goto_device))  # Soft Purple
+        button_layout.addWidget(self.create_button("Set Device", "#FFA500", self.set_device))  # Light Orange
         button_layout.addWidget(self.create_button("Disconnect Pins", "#B22222", self.disconnect_pins))  # Deep Red
         button_layout.addWidget(self.create_button("Reconnect Pins", "#2E8B57", self.reconnect_pins))  # Emerald Green
+        button_layout.addWidget(self.create_button("Run Campaign", "#9370DB", self.run_campaign))  # Soft Purple
+        button_layout.addWidget(self.create_button("Trigger Mode", "#9370DB", self.trigger_mode))  # Soft Purple
+        button_layout.addWidget(self.create_button("Stop Campaign", "#B22222", self.stop_campaign))  # Deep Red
+        button_layout.addWidget(self.create_button("Show Metrics", "#008080", self.show_metrics))  # Teal
         button_layout.addWidget(self.create_button("Disconnect From Device", "#B22222", self.disconnect_from_device))  # Deep Red
         control_panel.addLayout(button_layout)
 
         main_layout.addLayout(control_panel, 2)
 
         # Log Panel
-        log_panel = QtWidgets.QVBoxLayout()
-        log_label = QtWidgets.QLabel("Log")
-        log_label.setFont(QtGui.QFont("Arial", 16, QtGui.QFont.Bold))
-        log_panel.addWidget(log_label)
-        self.log_text = QtWidgets.QTextEdit()
-        self.log_text.setReadOnly(True)
-        self.log_text.setStyleSheet("background-color: #f0f0f0; padding: 10px; border-radius: 5px; font-size: 14px;")
-        log_panel.addWidget(self.log_text)
-
-        main_layout.addLayout(log_panel, 1)
+        self.log_panel = LogPanel()
+        main_layout.addWidget(self.log_panel, 1)
         self.setLayout(main_layout)
 
     def create_input_field(self, label_text, layout):
@@ -102,45 +544,184 @@ class DeviceControlApp(QtWidgets.QWidget):
         layout.addRow(label, input_field)
         return input_field
 
-    def create_button(self, text, color, callback):
+    def create_button(self, text, color, callback=None):
         button = QtWidgets.QPushButton(text)
         button.setStyleSheet(
             f"background-color: {color}; color: white; padding: 10px 20px; font-size: 16px; border-radius: 10px;"
         )
         button.setFixedHeight(50)
-        button.clicked.connect(callback)
+        if callback is not None:
+            button.clicked.connect(callback)
         return button
 
-    def log_message(self, message):
-        self.log_text.append(message)
+    def create_hold_button(self, text, color, axis, direction):
+        button = self.create_button(text, color)
+        button.pressed.connect(lambda: self.start_jog(axis, direction))
+        button.released.connect(self.stop_jog)
+        return button
+
+    def log_message(self, message, level=None, rig=None):
+        if level is None:
+            level = "Error" if "Error" in message else "Info"
+        self.log_panel.add(message, level, rig)
+
+    def startup_done(self):
+        # Runs from the event loop, once the window has been shown
+        ready = time.perf_counter()
+        parts = f"imports {IMPORT_TIME - START_TIME:.2f} s, window {ready - IMPORT_TIME:.2f} s"
+        age = process_age()
+        if age is None:
+            self.log_message(f"Control panel ready {ready - START_TIME:.2f} s from module load ({parts})")
+        else:
+            launch = max(age - (ready - START_TIME), 0.0)
+            self.log_message(
+                f"Control panel ready {age:.2f} s after launch "
+                f"(interpreter and unpacking {launch:.2f} s, {parts})"
+            )
+        worker = RemoteWorker(preload_ssh)
+        worker.signals.result.connect(lambda seconds: self.log_message(f"SSH support loaded in {seconds:.2f} s"))
+        worker.signals.error.connect(lambda error: self.log_message(f"Error loading SSH support: {error}"))
+        self.preload_worker = worker
+        self.thread_pool.start(worker)
+
+    def eventFilter(self, watched, event):
+        # Arrow keys jog while this window is active, except in text fields
+        if event.type() not in (QtCore.QEvent.KeyPress, QtCore.QEvent.KeyRelease) or event.key() not in JOG_KEYS:
+            return False
+        if event.type() == QtCore.QEvent.KeyRelease:
+            if event.key() != self.jog_key:
+                return False
+            if not event.isAutoRepeat():
+                self.jog_key = None
+                self.stop_jog()
+            return True
+        if event.isAutoRepeat():
+            return event.key() == self.jog_key
+        if not self.isActiveWindow() or isinstance(QtWidgets.QApplication.focusWidget(), QtWidgets.QLineEdit):
+            return False
+        if self.jog_key is None:
+            self.jog_key = event.key()
+            self.start_jog(*JOG_KEYS[event.key()])
+        return True
+
+    def changeEvent(self, event):
+        # A key released in another window never reaches us, stop the jog instead
+        if event.type() == QtCore.QEvent.ActivationChange and not self.isActiveWindow():
+            self.jog_key = None
+            self.stop_jog()
+        super().changeEvent(event)
+
+    def closeEvent(self, event):
+        self.stop_jog()
+        save_rigs(self.rigs)
+        self.log_panel.flush()
+        super().closeEvent(event)
+
+    # Rig list
+    def add_rig(self, settings):
+        rig = RigController(self, settings)
+        if not settings:
+            rig.values["name"] = f"Rig {len(self.rigs) + 1}"
+        self.rigs.append(rig)
+        row = self.rig_table.rowCount()
+        self.rig_table.blockSignals(True)
+        self.rig_table.insertRow(row)
+        use_item = QtWidgets.QTableWidgetItem()
+        use_item.setFlags(QtCore.Qt.ItemIsUserCheckable | QtCore.Qt.ItemIsEnabled)
+        use_item.setCheckState(QtCore.Qt.Checked)
+        self.rig_table.setItem(row, 0, use_item)
+        for column, field in enumerate(RIG_FIELDS, start=1):
+            self.rig_table.setItem(row, column, QtWidgets.QTableWidgetItem(rig.values[field]))
+        for column, text in ((len(RIG_COLUMNS) - 2, ""), (len(RIG_COLUMNS) - 1, rig.status)):
+            item = QtWidgets.QTableWidgetItem(text)
+            item.setFlags(QtCore.Qt.ItemIsEnabled)  # Read only
+            self.rig_table.setItem(row, column, item)
+        self.rig_table.blockSignals(False)
+        self.rigs_changed()
+
+    def remove_rig(self):
+        row = self.rig_table.currentRow()
+        if row < 0:
+            self.log_message("Please select the rig to remove.")
+            return
+        rig = self.rigs[row]
+        if rig.busy or rig.connection is not None:
+            self.log_message(f"Disconnect {rig.name} before removing it.")
+            return
+        del self.rigs[row]
+        self.rig_table.removeRow(row)
+        self.rigs_changed()
+
+    def rig_item_changed(self, item):
+        column = item.column()
+        if 1 <= column <= len(RIG_FIELDS):
+            self.rigs[item.row()].values[RIG_FIELDS[column - 1]] = item.text().strip()
+            self.rigs_changed()
+
+    def rigs_changed(self):
+        save_rigs(self.rigs)
+        self.log_panel.set_rigs([rig.name for rig in self.rigs])
+        self.update_status()
+
+    def rig_status_changed(self, rig):
+        if rig in self.rigs:
+            self.rig_table.item(self.rigs.index(rig), len(RIG_COLUMNS) - 1).setText(rig.status)
+        self.update_status()
+
+    def jogs_changed(self, rig):
+        if rig in self.rigs:
+            self.rig_table.item(self.rigs.index(rig), len(RIG_COLUMNS) - 2).setText(rig.jogs.text())
+
+    def update_status(self):
+        busy = sum(1 for rig in self.rigs if rig.busy)
+        connected = sum(1 for rig in self.rigs if rig.connection is not None)
+        if busy:
+            self.status_label.setText(f"Device Status: {busy} of {len(self.rigs)} rigs running")
+        elif connected:
+            self.status_label.setText(f"Device Status: {connected} of {len(self.rigs)} rigs connected")
+        else:
+            self.status_label.setText("Device Status: Idle")
+
+    def selected_rigs(self):
+        rigs = [
+            rig for row, rig in enumerate(self.rigs)
+            if self.rig_table.item(row, 0).checkState() == QtCore.Qt.Checked
+        ]
+        if not rigs:
+            self.log_message("Please tick at least one rig.")
+        return rigs
+
+    def execute_remote_command(self, file_name, *extra_args):
+        # The same command on every ticked rig, each on its own worker
+        for rig in self.selected_rigs():
+            rig.execute_remote_command(file_name, *extra_args)
 
     def connect_to_pi(self):
-        try:
-            hostname = self.ip_address_input.text().strip()
-            if not hostname:
-                self.log_message("Please enter a valid IP address.")
-                return
-
-            username = "team6"
-            password = "team6"
-
-            self.ssh_client = paramiko.SSHClient()
-            self.ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            self.ssh_client.connect(hostname, username=username, password=password)
-            self.log_message(f"Connected to Raspberry Pi at {hostname} via SSH")
-            self.status_label.setText("Device Status: Connected")
-            self.execute_remote_command("connect_to_device")
-
-            self.ssh_client.exec_command("sudo pigpiod")
-        except Exception as e:
-            self.log_message(f"Error connecting to Raspberry Pi: {e}")
-            self.status_label.setText("Device Status: Error")
+        for rig in self.selected_rigs():
+            rig.connect()
 
     def step_forward(self):
-        self.execute_remote_command("step_forward")
+        for rig in self.selected_rigs():
+            rig.jog(1)
 
     def step_backward(self):
-        self.execute_remote_command("step_backward")
+        for rig in self.selected_rigs():
+            rig.jog(-1)
+
+    def cancel_jogs(self):
+        for rig in self.selected_rigs():
+            rig.cancel_jogs()
+
+    def jog_rate(self):
+        return self.jog_speed_slider.value() / 100
+
+    def start_jog(self, axis, direction):
+        for rig in self.selected_rigs():
+            rig.start_jog(axis, direction, self.jog_rate())
+
+    def stop_jog(self):
+        for rig in self.rigs:
+            rig.stop_jog()
 
     def test_connection(self):
         self.execute_remote_command("Test_Connection")
@@ -148,57 +729,111 @@ class DeviceControlApp(QtWidgets.QWidget):
     def test_first_device(self):
         self.execute_remote_command("test_first_device")
 
+    def home_axes(self):
+        self.execute_remote_command("home")
+
     def next_device(self):
         self.execute_remote_command("next_device")
 
     def previous_device(self):
         self.execute_remote_command("previous_device")
 
+    def goto_device(self):
+        target = get_input_value(self.goto_device_input)
+        if target is None:
+            self.log_message("Please enter the device number to go to.")
+            return
+        for rig in self.selected_rigs():
+            if not rig.has_motion_server():
+                rig.log("Go To Device needs the motion server. Please reconnect.")
+                continue
+            rig.execute_remote_command("goto_device", rig.total_ics, int(target))
+
+    def set_device(self):
+        # After aligning the pins by hand: records the device they are on
+        device = get_input_value(self.set_device_input)
+        if device is None:
+            self.log_message("Please enter the device number the pins are on.")
+            return
+        for rig in self.selected_rigs():
+            if not rig.has_motion_server():
+                rig.log("Set Device needs the motion server. Please reconnect.")
+                continue
+            rig.execute_remote_command("set_device", rig.total_ics, int(device))
+
     def disconnect_pins(self):
         self.execute_remote_command("disconnect_pins")
 
     def reconnect_pins(self):
         self.execute_remote_command("reconnect_pins")
 
+    def run_campaign(self):
+        first_device = get_input_value(self.first_device_input)
+        last_device = get_input_value(self.last_device_input)
+        dwell_time = get_input_value(self.dwell_time_input)
+        home_every = get_input_value(self.home_every_input) or 0  # Empty means never
+        if first_device is None or last_device is None or dwell_time is None:
+            self.log_message("Please fill in all campaign fields: First Device, Last Device, and Dwell Time.")
+            return
+        for rig in self.selected_rigs():
+            if not rig.has_motion_server():
+                rig.log("Campaign mode needs the motion server. Please reconnect.")
+                continue
+            if rig.execute_remote_command(
+                "campaign", rig.total_ics, int(first_device), int(last_device), dwell_time, int(home_every)
+            ):
+                rig.log(f"Starting campaign on devices {int(first_device)} to {int(last_device)}")
+
+    def trigger_mode(self):
+        last_device = get_input_value(self.last_device_input) or 0  # Empty runs until stopped
+        for rig in self.selected_rigs():
+            if not rig.has_motion_server():
+                rig.log("Trigger mode needs the motion server. Please reconnect.")
+                continue
+            if rig.execute_remote_command("trigger_mode", rig.total_ics, int(last_device)):
+                rig.log("Trigger mode on, the test equipment now advances the devices")
+
+    def stop_campaign(self):
+        for rig in self.selected_rigs():
+            rig.stop_campaign()
+
+    def show_metrics(self):
+        for rig in self.selected_rigs():
+            rig.show_metrics()
+
     def disconnect_from_device(self):
-        if self.ssh_client:
-            self.execute_remote_command("disconnect_from_device")
-            self.ssh_client.close()
-            self.log_message("Disconnected from Raspberry Pi")
-            self.status_label.setText("Device Status: Disconnected")
-        else:
-            self.log_message("No active connection to disconnect.")
+        for rig in self.selected_rigs():
+            rig.disconnect()
 
-    def execute_remote_command(self, file_name):
-        if not self.ssh_client or not self.ssh_client.get_transport().is_active():
-            self.log_message("Not connected to Raspberry Pi. Please connect first.")
-            return
-        try:
 
-            gear_ratio = get_input_value(self.gear_ratio_input)
-            steps_per_rotation = get_input_value(self.steps_per_rotation_input)
-            total_ics = get_input_value(self.total_ics_input)
+class WorkerSignals(QtCore.QObject):
+    """
+    Signals a RemoteWorker uses to report back to the GUI thread.
+    """
+    progress = QtCore.pyqtSignal(str)
+    result = QtCore.pyqtSignal(object)
+    error = QtCore.pyqtSignal(str)
 
-            if gear_ratio is None or steps_per_rotation is None or total_ics is None:
-                self.log_message("Please fill in all fields: Gear Ratio, Steps per Rotation, and Total ICs.")
-                return
 
-            if total_ics == 0:
-                self.log_message("Total ICs cannot be zero.")
-                return
+class RemoteWorker(QtCore.QRunnable):
+    """
+    Runs a blocking function on a QThreadPool thread. The function gets a
+    `report` callback as its first argument that logs through the GUI thread.
+    """
 
-            computed_value = (gear_ratio * steps_per_rotation) / total_ics
-            command = f"python3 /home/team6/Desktop/stepper_testing/{file_name}.py {computed_value}"
-            stdin, stdout, stderr = self.ssh_client.exec_command(command)
-            output = stdout.read().decode()
-            error = stderr.read().decode()
+    def __init__(self, function, *args):
+        super().__init__()
+        self.function = function
+        self.args = args
+        self.signals = WorkerSignals()
 
-            if output:
-                self.log_message(f"{computed_value} Output: {output}")
-            if error:
-                self.log_message(f"{computed_value} Error: {error}")
+    def run(self):
+        try:
+            result = self.function(self.signals.progress.emit, *self.args)
         except Exception as e:
-            self.log_message(f"Error executing : {e}")
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.result.emit(result)
 
 
 def main():
@@ -206,6 +841,7 @@ def main():
     window = DeviceControlApp()
     window.show()
     window.showMaximized()
+    QtCore.QTimer.singleShot(0, window.startup_done)
     sys.exit(app.exec_())
 
 
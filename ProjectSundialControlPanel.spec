@@ -1,16 +1,21 @@
 # -*- mode: python ; coding: utf-8 -*-
 
+# One-folder build: the app starts straight from the installed files instead
+# of unpacking a one-file archive into a temporary directory on every launch.
+# UPX is off because compressed libraries are decompressed at each start too.
+# paramiko is imported lazily by the control panel, so it is listed here to
+# make sure it is bundled.
 
 a = Analysis(
     ['ProjectSundialControlPanel.py'],
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=['paramiko'],
+    hiddenimports=['paramiko', 'ssh_connection'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['tkinter'],
     noarchive=False,
     optimize=0,
 )
@@ -19,16 +24,13 @@ pyz = PYZ(a.pure)
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='ProjectSundialControlPanel',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
+    upx=False,
     console=False,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -36,8 +38,17 @@ exe = EXE(
     codesign_identity=None,
     entitlements_file=None,
 )
-app = BUNDLE(
+coll = COLLECT(
     exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='ProjectSundialControlPanel',
+)
+app = BUNDLE(
+    coll,
     name='ProjectSundialControlPanel.app',
     icon=None,
     bundle_identifier=None,
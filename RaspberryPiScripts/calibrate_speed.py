@@ -0,0 +1,5 @@
+from sundial_motion import run_script
+import speed_calibration
+
+# Usage: python3 calibrate_speed.py actuator|pcb
+run_script(speed_calibration.calibrate)
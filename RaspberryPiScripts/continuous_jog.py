@@ -0,0 +1,143 @@
+from collections import OrderedDict
+from time import sleep, monotonic
+import threading
+import math
+import pigpio
+from stepper_waves import step_pulses, create_wave, delete_waves, wait_for_wave
+from motion_telemetry import telemetry
+
+# Press-and-hold jog for fine alignment. While a jog button is held the
+# control panel keeps sending the wanted rate (a fraction of the axis max
+# velocity) with the jog_rate query, and the jog command turns that rate into
+# steps: it builds JOG_CHUNK_S worth of steps at a time, ramping the velocity
+# towards the requested rate at the axis acceleration, and queues each chunk
+# behind the one being sent (WAVE_MODE_ONE_SHOT_SYNC) so the pulse train has
+# no gaps.
+#
+# Releasing the button sends a rate of 0 and the axis decelerates to a stop.
+# If the rate is not refreshed for JOG_WATCHDOG_S (link lost, panel closed)
+# it stops the same way. From the release to standstill takes at most the two
+# queued chunks plus the deceleration from max velocity, see stop_latency().
+
+JOG_CHUNK_S = 0.02    # Seconds of steps per queued wave
+JOG_WATCHDOG_S = 0.5  # Stop when the rate has not been refreshed for this long
+MAX_PRESSES = 16      # Button presses whose rate is remembered
+
+
+class JogControl:
+    """
+    The rate the control panel asked for, per button press. The jog command
+    and its jog_rate queries travel on different channels, so the release of
+    a short tap can arrive before the jog it ends. Keying the rate by press
+    keeps the jog from starting up again afterwards.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = OrderedDict()  # press -> (rate, time of the last update)
+
+    def set_rate(self, press, rate, only_new=False):
+        with self.lock:
+            if only_new and press in self.requests:
+                return
+            self.requests[press] = (min(max(rate, 0.0), 1.0), monotonic())
+            self.requests.move_to_end(press)
+            while len(self.requests) > MAX_PRESSES:
+                self.requests.popitem(last=False)
+
+    def rate(self, press):
+        with self.lock:
+            rate, updated = self.requests.get(press, (0.0, 0.0))
+        if monotonic() - updated > JOG_WATCHDOG_S:
+            return 0.0
+        return rate
+
+    def stop_requested_at(self, press):
+        # When the release arrived, or when the watchdog ran out
+        with self.lock:
+            rate, updated = self.requests.get(press, (0.0, 0.0))
+        return updated if rate == 0.0 else updated + JOG_WATCHDOG_S
+
+
+jog_control = JogControl()  # Shared by the jog command and the jog_rate query
+
+
+def stop_latency(axis):
+    return 2 * JOG_CHUNK_S + axis.profile.max_velocity / axis.profile.acceleration
+
+
+def next_chunk(velocity, target, profile):
+    """
+    Step periods for the next chunk, ramping from `velocity` towards `target`
+    (steps/s, 0 to stop). Returns (periods, velocity at the end of the chunk);
+    the periods are empty once the axis has stopped.
+    """
+    periods = []
+    elapsed = 0.0
+    while elapsed < JOG_CHUNK_S:
+        if velocity == 0:
+            velocity = profile.start_velocity if target else 0.0
+        elif velocity < target:
+            # v^2 = v0^2 + 2*a per step, as in motion_profiles.trapezoid_ramp
+            velocity = min(math.sqrt(velocity * velocity + 2 * profile.acceleration), target)
+        elif velocity > target:
+            velocity = math.sqrt(max(velocity * velocity - 2 * profile.acceleration, 0.0))
+            if velocity < max(target, profile.start_velocity):
+                velocity = target  # The start velocity is safe to stop from
+        if velocity <= 0:
+            break
+        period = int(round(1e6 / velocity))
+        periods.append(period)
+        elapsed += period / 1e6
+    return periods, velocity
+
+
+def jog(rig, computed_value, axis_name, direction, press=0, rate=1.0):
+    """
+    Moves one stepper axis for as long as the rate of this press stays above
+    zero. Returns the steps moved and how long the stop took.
+    """
+    if axis_name not in rig.steppers:
+        raise ValueError(f"Unknown axis: {axis_name}")
+    axis = rig.steppers[axis_name]
+    profile = axis.profile
+    pi = rig.pi
+    press = int(press)
+    direction = int(direction)
+    jog_control.set_rate(press, float(rate), only_new=True)
+
+    pi.write(axis.dir_pin, direction)
+    axis.enable()
+    rig.state.begin_move(axis.name)
+    queued = []  # Waves sent and not yet finished, oldest first
+    velocity = 0.0
+    steps = 0
+    try:
+        while True:
+            rate = jog_control.rate(press)
+            target = max(rate * profile.max_velocity, profile.start_velocity) if rate > 0 else 0.0
+            periods, velocity = next_chunk(velocity, target, profile)
+            if not periods:
+                break
+            pulses = [pulse for period in periods for pulse in step_pulses(axis.step_pin, period)]
+            wave_id = create_wave(pi, pulses)
+            pi.wave_send_using_mode(wave_id, pigpio.WAVE_MODE_ONE_SHOT_SYNC)
+            queued.append(wave_id)
+            steps += len(periods)
+            # Two chunks in flight: plan the next one while the newer one waits
+            while len(queued) > 1 and pi.wave_tx_at() == queued[0]:
+                sleep(0.002)
+            while len(queued) > 1:
+                pi.wave_delete(queued.pop(0))
+        wait_for_wave(pi)
+        stop_seconds = max(monotonic() - jog_control.stop_requested_at(press), 0.0)
+    finally:
+        pi.wave_tx_stop()
+        delete_waves(pi, queued)
+        rig.state.end_move(axis.name, steps, direction)
+        axis.last_move = (steps, direction)
+        if not axis.hold_after_move:
+            axis.disable()
+    telemetry.record_stop(axis.name, stop_seconds)
+    return (f"Jogged {axis.name} {steps} steps, stopped {stop_seconds:.3f} s after release "
+            f"(at most {stop_latency(axis):.3f} s)")
@@ -0,0 +1,4 @@
+from sundial_motion import run_script
+import homing
+
+run_script(homing.home)
@@ -0,0 +1,67 @@
+from motion_profiles import step_periods
+from sequence_plans import load_definitions, run_sequence
+
+# Brings the axes back to a known position after a fault (lost steps, a script
+# interrupted part way) without nudging them step by step.
+#
+# Each axis runs towards its home switch at full speed; a pigpio callback
+# stops the wave the moment the switch closes (StepperAxis.seek_home). It
+# then backs off until the switch opens and comes back in slowly, so the
+# final position does not depend on how far the fast run overshot.
+# HOME_OFFSET steps from the switch is the reference position: the retracted
+# actuator, and device 1 on the PCB.
+
+HOME_SEARCH = {"actuator": 1000, "pcb": 5000}  # Steps to look for the switch
+HOME_OFFSET = {"actuator": 0, "pcb": 0}        # Switch to reference position
+HOME_BACKOFF = 30     # Steps to back off between the fast and the slow approach
+SLOW_FACTOR = 0.25    # Slow approach speed as a fraction of the start velocity
+
+
+def constant_periods(axis, steps, factor=1.0):
+    return (int(round(1e6 / (axis.profile.start_velocity * factor))),) * steps
+
+
+def seek(axis, periods, direction):
+    # True if the switch closed; the position is reset once homing completes
+    return axis.seek_home(len(periods), direction, periods) is not None
+
+
+def home_axis(axis):
+    if axis.home_pin is None:
+        raise ValueError(f"No home switch fitted on the {axis.name} axis.")
+    toward = axis.home_direction
+    away = 1 - toward
+
+    if not seek(axis, step_periods(HOME_SEARCH[axis.name], axis.profile), toward):
+        raise RuntimeError(f"{axis.name} home switch not found within {HOME_SEARCH[axis.name]} steps.")
+
+    for _ in range(4):
+        axis.move(HOME_BACKOFF, away, constant_periods(axis, HOME_BACKOFF))
+        if not axis.at_home():
+            break
+    else:
+        raise RuntimeError(f"{axis.name} home switch stays closed, check the wiring.")
+
+    if not seek(axis, constant_periods(axis, 4 * HOME_BACKOFF, SLOW_FACTOR), toward):
+        raise RuntimeError(f"{axis.name} home switch not found on the slow approach.")
+
+    offset = HOME_OFFSET[axis.name]
+    if offset:
+        axis.move(offset, away, constant_periods(axis, offset))
+    axis.rig.state.set_position(axis.name, 0)
+
+
+def home(rig, computed_value=None):
+    """
+    Homes both axes and seats the pins on device 1: retract to the actuator
+    switch, swing the servo out, home the PCB, then reconnect.
+    """
+    constants = load_definitions()["constants"]
+    home_axis(rig.actuator)
+    rig.servo.move(constants["servo_out"])
+    rig.servo.settle()
+    home_axis(rig.pcb)
+    rig.indexer.commit(0.0)  # The step fraction is meaningless after homing
+    rig.state.set_device(1)
+    run_sequence(rig, "reconnect_pins")
+    return "Homed, pins on device 1"
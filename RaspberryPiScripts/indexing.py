@@ -0,0 +1,32 @@
+import math
+
+# Turns device moves into whole PCB steps without dropping the fraction.
+# One device is (gear_ratio * steps_per_rotation) / total_ics steps, which is
+# rarely a whole number. Truncating every move lets the error build up over a
+# board; here the part that could not be stepped is carried into the next
+# move (like Bresenham's line algorithm), so after any number of devices the
+# PCB is within half a step of the exact position.
+#
+# PCB_MICROSTEPS is the microstep setting of the PCB driver. With the driver
+# strapped for microstepping the same carry works at the finer resolution;
+# 1 means full steps, which is how the rig is wired today.
+
+PCB_MICROSTEPS = 1
+
+
+class DeviceIndexer:
+    def __init__(self, state, microsteps=PCB_MICROSTEPS):
+        self.state = state
+        self.microsteps = microsteps
+
+    def plan(self, devices, steps_per_device):
+        """
+        Signed driver steps for a move of `devices` devices (negative is
+        backwards), and the remainder to store once the move has been made.
+        """
+        exact = devices * steps_per_device * self.microsteps + self.state["pcb_remainder"]
+        steps = int(math.floor(exact + 0.5))
+        return steps, exact - steps
+
+    def commit(self, remainder):
+        self.state.set_remainder(remainder)
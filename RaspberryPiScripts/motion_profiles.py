@@ -0,0 +1,127 @@
+from collections import namedtuple
+from functools import lru_cache
+import os
+import json
+import math
+
+# Acceleration profiles for the stepper axes. A profile turns a move of N
+# steps into a list of step periods (microseconds) that ramps up from a safe
+# start speed, cruises at max_velocity and ramps back down. The periods feed
+# straight into stepper_waves.build_step_train.
+#
+# Units: velocity in steps/s, acceleration in steps/s^2, jerk in steps/s^3.
+# A jerk of 0 gives a trapezoidal profile, anything else an S-curve.
+
+MotionProfile = namedtuple("MotionProfile", ["start_velocity", "max_velocity", "acceleration", "jerk"])
+
+# Start speeds match the old fixed step delays (0.005 s and 0.0067 s high/low)
+ACTUATOR_PROFILE = MotionProfile(start_velocity=100.0, max_velocity=300.0, acceleration=1500.0, jerk=0.0)
+PCB_PROFILE = MotionProfile(start_velocity=75.0, max_velocity=200.0, acceleration=800.0, jerk=20000.0)
+
+SIM_DT = 1e-5  # Integration step for the S-curve ramp (seconds)
+
+# Profiles found by speed_calibration.py for this rig, in full steps. Axes
+# that were never calibrated keep the defaults above.
+PROFILE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "axis_profiles.json")
+DEFAULT_PROFILES = {"actuator": ACTUATOR_PROFILE, "pcb": PCB_PROFILE}
+
+
+def check_profile(profile):
+    if profile.start_velocity <= 0 or profile.max_velocity <= 0:
+        raise ValueError("Profile velocities must be positive.")
+    if profile.max_velocity < profile.start_velocity:
+        raise ValueError("max_velocity must not be below start_velocity.")
+    if profile.acceleration <= 0 or profile.jerk < 0:
+        raise ValueError("Profile acceleration must be positive and jerk non-negative.")
+
+
+def trapezoid_ramp(profile):
+    # v^2 = v0^2 + 2*a*s evaluated at each step until max_velocity is reached
+    ramp = []
+    v0 = profile.start_velocity
+    while True:
+        v = math.sqrt(v0 * v0 + 2 * profile.acceleration * len(ramp))
+        if v >= profile.max_velocity:
+            return ramp
+        ramp.append(v)
+
+
+def s_curve_ramp(profile):
+    # Integrate a jerk limited ramp and sample the velocity at each whole step
+    ramp = []
+    v = profile.start_velocity
+    a = 0.0
+    position = 0.0
+    while v < profile.max_velocity:
+        if position >= len(ramp):
+            ramp.append(v)
+        # Start easing off the acceleration once that alone would reach max_velocity
+        if v + a * a / (2 * profile.jerk) >= profile.max_velocity:
+            a = max(a - profile.jerk * SIM_DT, profile.jerk * SIM_DT)
+        else:
+            a = min(a + profile.jerk * SIM_DT, profile.acceleration)
+        v += a * SIM_DT
+        position += v * SIM_DT
+    return ramp
+
+
+@lru_cache(maxsize=32)
+def acceleration_ramp(profile):
+    """
+    Velocity at each step while accelerating from start_velocity up to
+    max_velocity. Cached per profile.
+    """
+    check_profile(profile)
+    if profile.jerk:
+        return tuple(s_curve_ramp(profile))
+    return tuple(trapezoid_ramp(profile))
+
+
+@lru_cache(maxsize=256)
+def step_periods(steps, profile):
+    """
+    Per-step periods in microseconds for a move of `steps` steps.
+    The ramp down mirrors the ramp up; short moves never reach cruise speed.
+    Cached per (steps, profile) so repeated moves are not re-planned.
+    """
+    ramp = acceleration_ramp(profile)
+    periods = []
+    for i in range(steps):
+        # Limited by how far we are from both the start and the end of the move
+        ramp_index = min(i, steps - 1 - i)
+        velocity = ramp[ramp_index] if ramp_index < len(ramp) else profile.max_velocity
+        periods.append(int(round(1e6 / velocity)))
+    return tuple(periods)
+
+
+@lru_cache(maxsize=32)
+def scaled_profile(profile, factor):
+    # Same motion in finer steps, e.g. for a microstepping driver
+    return MotionProfile(*(value * factor for value in profile))
+
+
+def load_profiles(path=PROFILE_FILE):
+    profiles = dict(DEFAULT_PROFILES)
+    try:
+        with open(path) as profile_file:
+            data = json.load(profile_file)
+    except (OSError, ValueError):
+        return profiles
+    for axis, values in data.items():
+        profile = MotionProfile(**values)
+        check_profile(profile)
+        profiles[axis] = profile
+    return profiles
+
+
+def save_profile(axis, profile, path=PROFILE_FILE):
+    try:
+        with open(path) as profile_file:
+            data = json.load(profile_file)
+    except (OSError, ValueError):
+        data = {}
+    data[axis] = profile._asdict()
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as profile_file:
+        json.dump(data, profile_file, indent=4)
+    os.replace(temp_path, path)
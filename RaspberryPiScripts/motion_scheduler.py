@@ -0,0 +1,119 @@
+from time import sleep, monotonic
+from collections import deque
+import threading
+
+# Runs a device handling sequence as a set of moves instead of a fixed list of
+# move + sleep calls. Every move names the axes (resources) it uses and the
+# moves it has to wait for; moves on independent axes run at the same time.
+#
+# A move normally starts once its dependencies have finished and settled. With
+# `overlap` it may start that many seconds before the dependencies are
+# expected to finish, e.g. the servo swing during the last part of an actuator
+# stroke. Expected durations come from the precomputed step profiles.
+
+# Seconds each axis needs after its move before the next dependent move.
+# Step trains are hardware timed, so this only covers mechanical settling.
+# Moves with a `settle_wait` detect the end of settling instead (see
+# settle_detection.py) and use this only as the expected value for planning.
+SETTLE_TIME = {
+    "actuator": 0.2,
+    "pcb": 0.2,
+    "servo": 0.3,
+}
+
+axis_locks = {}
+axis_locks_guard = threading.Lock()
+
+# Moves of the plans run since the last clear, for the "timings" query
+finished_moves = deque(maxlen=256)
+
+
+def axis_lock(axis):
+    with axis_locks_guard:
+        if axis not in axis_locks:
+            axis_locks[axis] = threading.Lock()
+        return axis_locks[axis]
+
+
+class Move:
+    def __init__(self, name, axes, action, duration=0.0, settle=0.0, after=(), overlap=0.0, settle_wait=None):
+        self.name = name
+        self.axes = tuple(sorted(axes))  # Fixed lock order avoids deadlocks
+        self.action = action
+        self.duration = duration
+        self.settle = settle
+        self.after = list(after)
+        self.overlap = overlap
+        self.settle_wait = settle_wait  # Detects the end of settling instead of sleeping `settle`
+        self.settle_time = None
+        self.settle_source = None
+        self.start_time = None
+        self.end_time = None
+        self.error = None
+        self.started = threading.Event()
+        self.done = threading.Event()
+
+    def wait_for_dependencies(self):
+        for dependency in self.after:
+            if self.overlap > 0:
+                dependency.started.wait()
+                if dependency.start_time is not None:
+                    start_at = dependency.start_time + dependency.duration - self.overlap
+                    delay = start_at - monotonic()
+                    if delay > 0:
+                        sleep(delay)
+            else:
+                dependency.done.wait()
+            if dependency.error is not None:
+                raise RuntimeError(f"{self.name} skipped, {dependency.name} failed")
+
+    def run(self):
+        try:
+            self.wait_for_dependencies()
+            locks = [axis_lock(axis) for axis in self.axes]
+            for lock in locks:
+                lock.acquire()
+            try:
+                self.start_time = monotonic()
+                self.started.set()
+                self.action()
+                if self.settle_wait is None:
+                    sleep(self.settle)
+                    self.settle_time, self.settle_source = self.settle, "fixed"
+                else:
+                    self.settle_time, self.settle_source = self.settle_wait()
+            finally:
+                self.end_time = monotonic()
+                for lock in reversed(locks):
+                    lock.release()
+        except Exception as e:
+            self.error = e
+        finally:
+            # Release anyone waiting on us, even on failure
+            self.started.set()
+            self.done.set()
+
+
+class MotionPlan:
+    def __init__(self):
+        self.moves = []
+
+    def add(self, name, axes, action, duration=0.0, settle=0.0, after=(), overlap=0.0, settle_wait=None):
+        move = Move(name, axes, action, duration, settle, after, overlap, settle_wait)
+        self.moves.append(move)
+        return move
+
+    def run(self):
+        """
+        Runs all moves, each on its own thread, and blocks until they are
+        finished. Raises the first error any move hit.
+        """
+        threads = [threading.Thread(target=move.run, name=move.name, daemon=True) for move in self.moves]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        finished_moves.extend(self.moves)
+        for move in self.moves:
+            if move.error is not None:
+                raise move.error
@@ -0,0 +1,188 @@
+from time import monotonic
+import socketserver
+import threading
+import types
+from sundial_motion import Rig
+from sequence_plans import plan_for
+import sequences
+import speed_calibration
+import homing
+import trigger_mode
+from continuous_jog import jog, jog_control
+from motion_scheduler import finished_moves
+from motion_telemetry import telemetry
+
+# Long-running motion server. Keeps one pigpio connection and the pin setup
+# warm so the control panel can send commands over a local socket instead of
+# starting a new interpreter for every button press.
+#
+# Protocol: one command per line, e.g. "next_device 25.0". The server answers
+# with zero or more output lines followed by "OK <seconds>" or "ERR <message>".
+# While a command runs (or waits for another to finish) a HEARTBEAT line goes
+# out every HEARTBEAT_INTERVAL seconds, so the control panel can tell a long
+# dwell from a dead link.
+
+HOST = "127.0.0.1"  # Only reachable locally (the control panel tunnels in over SSH)
+PORT = 8765
+HEARTBEAT = "PROGRESS busy"
+HEARTBEAT_INTERVAL = 5  # Seconds, well below READ_TIMEOUT in ssh_connection.py
+
+rig = None  # Created in main(), owns pigpio, the axes and the axis state
+motion_lock = threading.Lock()  # Only one command may drive the motors at a time
+
+
+def ping():
+    return "pong"
+
+
+def position():
+    return rig.state.describe()
+
+
+def stop():
+    rig.stop_requested.set()
+
+
+def timings():
+    # One line per move of the last command: name, seconds moving, seconds
+    # settling and how the end of settling was decided
+    lines = []
+    for move in finished_moves:
+        if move.start_time is None or move.settle_time is None:
+            continue
+        moving = move.end_time - move.start_time - move.settle_time
+        lines.append(f"{move.name.replace(' ', '_')} {moving:.4f} {move.settle_time:.4f} {move.settle_source}")
+    return "\n".join(lines)
+
+
+def jog_rate(press, rate):
+    # Streamed by the control panel while a jog button is held, 0 on release
+    jog_control.set_rate(int(press), float(rate))
+
+
+def metrics():
+    # Timing telemetry in the Prometheus text format (see motion_telemetry.py)
+    return "\n".join([telemetry.export(), rig.settle.export(), rig.waves.export()])
+
+
+# Command names match the script names the control panel already uses
+COMMANDS = {
+    "connect_to_device": sequences.connect_to_device,
+    "disconnect_from_device": sequences.disconnect_from_device,
+    "step_forward": sequences.step_forward,
+    "step_backward": sequences.step_backward,
+    "Test_Connection": sequences.test_connection,
+    "test_first_device": sequences.test_first_device,
+    "next_device": sequences.next_device,
+    "previous_device": sequences.previous_device,
+    "disconnect_pins": sequences.disconnect_pins,
+    "reconnect_pins": sequences.reconnect_pins,
+    "campaign": sequences.campaign,
+    "goto_device": sequences.goto_device,
+    "set_device": sequences.set_device,
+    "step": sequences.step,
+    "servo": sequences.servo,
+    "calibrate": speed_calibration.calibrate,
+    "home": homing.home,
+    "jog": jog,
+    "trigger_mode": trigger_mode.trigger_mode,
+}
+
+# Commands that never touch the motors and can run while a move is in progress
+QUERIES = {
+    "ping": ping,
+    "stop": stop,
+    "timings": timings,
+    "position": position,
+    "metrics": metrics,
+    "jog_rate": jog_rate,
+}
+
+
+class MotionRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.write_lock = threading.Lock()  # The heartbeat writes from its own thread
+        for line in self.rfile:
+            parts = line.decode().split()
+            if not parts:
+                continue
+            name, args = parts[0], parts[1:]
+            start = monotonic()
+            try:
+                if name in QUERIES:
+                    self.write_output(QUERIES[name](*args))
+                elif name in COMMANDS:
+                    done = threading.Event()
+                    threading.Thread(target=self.heartbeat, args=(done,), daemon=True).start()
+                    try:
+                        with motion_lock:
+                            finished_moves.clear()
+                            try:
+                                self.write_output(COMMANDS[name](rig, *args))
+                            finally:
+                                rig.stop_pwm()
+                    finally:
+                        done.set()
+                    telemetry.record_command(name, monotonic() - start)
+                else:
+                    raise ValueError(f"Unknown command: {name}")
+                # The elapsed time lets the control panel tell link time from motion time
+                self.write_line(f"OK {monotonic() - start:.3f}")
+            except Exception as e:
+                self.write_line(f"ERR {e}")
+
+    def write_line(self, line):
+        with self.write_lock:
+            self.wfile.write(f"{line}\n".encode())
+            self.wfile.flush()
+
+    def write_output(self, output):
+        # Generators (long running commands) stream each line as it is produced
+        if isinstance(output, types.GeneratorType):
+            for line in output:
+                self.write_line(line)
+        elif output:
+            self.write_line(output)
+
+    def heartbeat(self, done):
+        while not done.wait(HEARTBEAT_INTERVAL):
+            try:
+                self.write_line(HEARTBEAT)
+            except OSError:
+                return  # The client is gone, the command still finishes
+
+
+class MotionServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+def main():
+    global rig
+    try:
+        server = MotionServer((HOST, PORT), MotionRequestHandler)
+    except OSError:
+        print(f"Motion server already running on port {PORT}.")
+        return
+
+    try:
+        rig = Rig()
+    except ConnectionError as e:
+        print(e)
+        server.server_close()
+        return
+    # Compile the fixed sequences (and build their waves) before the first command
+    for sequence in ("disconnect_pins", "reconnect_pins", "test_connection"):
+        plan_for(rig, sequence)
+    print(f"Motion server listening on {HOST}:{PORT}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nCtrl-C pressed. Stopping PIGPIO and exiting...")
+    finally:
+        server.server_close()
+        rig.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+from array import array
+from bisect import bisect_left
+import threading
+import pigpio
+from percentiles import nearest_rank
+
+# Timing telemetry for the motion code, exported in the Prometheus text format
+# through the motion server's "metrics" query.
+#
+# Step jitter: while a stepper moves, a pigpio callback on its step pin stores
+# the tick (microseconds, from pigpiod) of every rising edge in a preallocated
+# array. After the move each actual step interval is compared with the
+# commanded period; the difference is the jitter. The callback only stores a
+# number, everything else happens once the move is over.
+#
+# Move and phase times: wall time of every stepper move against its commanded
+# duration, and of every move in a sequence plan (moving and settling).
+#
+# All samples go into fixed-size ring buffers backed by arrays, so memory
+# stays constant however long the server runs.
+
+BUFFER_SIZE = 4096           # Samples kept per series
+MAX_STEPS_RECORDED = 20000   # Step edges recorded per move
+DEADLINE_US = 50             # Step jitter above this counts as a missed deadline
+JITTER_BUCKETS_US = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+SECONDS_BUCKETS = (0.01, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0)
+
+
+class SampleBuffer:
+    """
+    The last `size` samples of one series (for the percentiles), plus bucket
+    counts and totals of everything ever added (for the histogram).
+    """
+
+    def __init__(self, buckets, size=BUFFER_SIZE):
+        self.samples = array("d", [0.0]) * size
+        self.size = size
+        self.next = 0
+        self.buckets = buckets
+        self.bucket_counts = array("L", [0]) * (len(buckets) + 1)  # Last one is +Inf
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value):
+        self.samples[self.next] = value
+        self.next = (self.next + 1) % self.size
+        self.bucket_counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def extend(self, values):
+        for value in values:
+            self.add(value)
+
+    def values(self):
+        if self.count < self.size:
+            return self.samples[:self.count]
+        return self.samples[self.next:] + self.samples[:self.next]
+
+    def percentile(self, fraction):
+        return nearest_rank(self.values(), fraction)
+
+    def histogram(self):
+        # Cumulative counts per upper bound, ending with +Inf
+        counts = []
+        running = 0
+        for count in self.bucket_counts:
+            running += count
+            counts.append(running)
+        return counts
+
+
+class StepRecorder:
+    """
+    Records the actual step edges of one move through a pigpio callback.
+    """
+
+    def __init__(self, pi, step_pin):
+        self.ticks = array("L", [0]) * MAX_STEPS_RECORDED
+        self.recorded = 0
+        self.callback = pi.callback(step_pin, pigpio.RISING_EDGE, self.edge)
+
+    def edge(self, gpio, level, tick):
+        if self.recorded < MAX_STEPS_RECORDED:
+            self.ticks[self.recorded] = tick
+            self.recorded += 1
+
+    def stop(self):
+        self.callback.cancel()
+
+    def intervals(self):
+        # Microseconds between consecutive steps (ticks wrap every ~72 minutes)
+        ticks = self.ticks
+        return [(ticks[i] - ticks[i - 1]) & 0xFFFFFFFF for i in range(1, self.recorded)]
+
+
+class Telemetry:
+    def __init__(self):
+        self.series = {}  # (metric, label value) -> SampleBuffer
+        self.missed = {}  # axis -> missed step deadlines
+        self.steps = {}   # axis -> steps measured
+        self.lock = threading.Lock()
+
+    def buffer(self, metric, label):
+        key = (metric, label)
+        if key not in self.series:
+            self.series[key] = SampleBuffer(JITTER_BUCKETS_US if metric.endswith("_us") else SECONDS_BUCKETS)
+        return self.series[key]
+
+    def start_move(self, pi, step_pin):
+        return StepRecorder(pi, step_pin)
+
+    def end_move(self, recorder, axis, periods_us, seconds):
+        recorder.stop()
+        # Step i (from 1) was commanded periods_us[i - 1] after step i - 1
+        jitter = [abs(actual - commanded) for actual, commanded in zip(recorder.intervals(), periods_us)]
+        with self.lock:
+            self.buffer("step_jitter_us", axis).extend(jitter)
+            self.missed[axis] = self.missed.get(axis, 0) + sum(1 for value in jitter if value > DEADLINE_US)
+            self.steps[axis] = self.steps.get(axis, 0) + len(jitter)
+            self.buffer("move_seconds", axis).add(seconds)
+            self.buffer("move_overrun_seconds", axis).add(seconds - sum(periods_us) / 1e6)
+
+    def record_phase(self, phase, moving, settling):
+        with self.lock:
+            self.buffer("phase_moving_seconds", phase).add(moving)
+            self.buffer("phase_settle_seconds", phase).add(settling)
+
+    def record_stop(self, axis, seconds):
+        # Release of a jog button to standstill
+        with self.lock:
+            self.buffer("move_stop_seconds", axis).add(seconds)
+
+    def record_trigger(self, to_motion, to_ready):
+        # Hardware trigger edge to the first step edge, and to the pins seated
+        with self.lock:
+            self.buffer("trigger_to_motion_seconds", "next_device").add(to_motion)
+            self.buffer("trigger_to_ready_seconds", "next_device").add(to_ready)
+
+    def record_command(self, command, seconds):
+        with self.lock:
+            self.buffer("command_seconds", command).add(seconds)
+
+    def export(self):
+        """
+        All series in the Prometheus text format: a histogram per series plus
+        p50/p99 gauges, and the missed deadline counters.
+        """
+        lines = []
+        with self.lock:
+            metrics = sorted({metric for metric, _ in self.series})
+            for metric in metrics:
+                label_name = "axis" if metric.startswith(("step_", "move_")) else "name"
+                lines.append(f"# TYPE sundial_{metric} histogram")
+                for (name, label), samples in sorted(self.series.items()):
+                    if name != metric:
+                        continue
+                    labels = f'{label_name}="{label}"'
+                    for bound, count in zip(samples.buckets + ("+Inf",), samples.histogram()):
+                        lines.append(f'sundial_{metric}_bucket{{{labels},le="{bound}"}} {count}')
+                    lines.append(f"sundial_{metric}_count{{{labels}}} {samples.count}")
+                    lines.append(f"sundial_{metric}_sum{{{labels}}} {samples.total:.6f}")
+                for quantile in ("50", "99"):
+                    lines.append(f"# TYPE sundial_{metric}_p{quantile} gauge")
+                    for (name, label), samples in sorted(self.series.items()):
+                        if name == metric:
+                            value = samples.percentile(int(quantile) / 100)
+                            lines.append(f'sundial_{metric}_p{quantile}{{{label_name}="{label}"}} {value:.6f}')
+            lines.append("# TYPE sundial_missed_step_deadlines_total counter")
+            for axis, count in sorted(self.missed.items()):
+                lines.append(f'sundial_missed_step_deadlines_total{{axis="{axis}"}} {count}')
+            lines.append("# TYPE sundial_steps_measured_total counter")
+            for axis, count in sorted(self.steps.items()):
+                lines.append(f'sundial_steps_measured_total{{axis="{axis}"}} {count}')
+        return "\n".join(lines)
+
+
+telemetry = Telemetry()  # Shared by the whole process
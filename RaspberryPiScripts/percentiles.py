@@ -0,0 +1,18 @@
+import math
+
+# Nearest-rank percentiles, shared by the motion telemetry on the Pi and by
+# benchmark_cycle_time.py on the PC, so both report the same p50/p99 for the
+# same samples. Kept free of other imports so the PC side can load it without
+# pigpio.
+
+
+def nearest_rank(values, fraction):
+    """
+    The smallest sample with at least `fraction` (0..1) of the samples at or
+    below it, or 0.0 without samples.
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = math.ceil(fraction * len(ordered)) - 1
+    return ordered[max(0, min(len(ordered) - 1, rank))]
@@ -0,0 +1,152 @@
+import os
+import json
+import threading
+
+# Absolute position of every axis, kept on disk so it survives a crash or a
+# power cycle. Stepper positions are signed step counts (direction 0 counts
+# up, direction 1 counts down), the servo position is its last pulse width and
+# `device` is the number of the IC the pins are on (None until known).
+#
+# `pcb_remainder` is the fraction of a step the device indexing still owes
+# (see indexing.py).
+#
+# `moving` lists the axes in motion when the state was last saved. An axis
+# still listed after a restart, or when its next move begins, stopped part
+# way; it is then added to `suspect`, as is an axis whose speed was
+# calibrated. A suspect axis keeps that flag, whatever
+# else moves, until homing (set_position) or the set_device command clears it,
+# and commands that trust the tracked device refuse to run meanwhile.
+
+STATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "axis_state.json")
+
+
+def device_offset(current, target, total_ics):
+    """
+    Signed number of devices to move from `current` to `target`, going the
+    short way around the board.
+    """
+    offset = (target - current) % total_ics
+    if offset > total_ics / 2:
+        offset -= total_ics
+    return offset
+
+
+class AxisState:
+    def __init__(self, path=STATE_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.values = {
+            "pcb": 0,
+            "actuator": 0,
+            "servo": 0,
+            "device": None,
+            "pcb_remainder": 0.0,
+            "moving": [],
+            "suspect": [],
+        }
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as state_file:
+                self.values.update(json.load(state_file))
+        except (OSError, ValueError):
+            return  # No usable state yet, start from zero
+        moving = self.values["moving"]
+        if isinstance(moving, str):
+            moving = [moving]  # Written by an older version
+        for axis in moving or []:
+            self.mark_suspect(axis)
+        self.values["moving"] = []
+
+    def save(self):
+        # Write a temporary file and rename it over the old one, so a crash
+        # leaves either the old or the new state on disk, never half of it
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as state_file:
+            json.dump(self.values, state_file)
+            state_file.flush()
+            os.fsync(state_file.fileno())
+        os.replace(temp_path, self.path)
+
+    def mark_suspect(self, axis):
+        if axis not in self.values["suspect"]:
+            self.values["suspect"].append(axis)
+
+    def lose_reference(self, axis):
+        # The axis was moved without keeping its tracked position (calibration)
+        with self.lock:
+            self.mark_suspect(axis)
+            self.save()
+
+    def clear_suspect(self, axis):
+        with self.lock:
+            if axis in self.values["suspect"]:
+                self.values["suspect"].remove(axis)
+                self.save()
+
+    def check_reliable(self, axis):
+        if axis in self.values["suspect"]:
+            raise ValueError(
+                f"The {axis} position is unreliable after an interrupted move or a calibration. "
+                "Home the axes or set the device first."
+            )
+
+    def begin_move(self, axis):
+        with self.lock:
+            if axis in self.values["moving"]:
+                self.mark_suspect(axis)  # The last move on this axis never finished
+            else:
+                self.values["moving"].append(axis)
+            self.save()
+
+    def end_move(self, axis, steps, direction):
+        with self.lock:
+            self.values[axis] += steps if direction == 0 else -steps
+            if axis in self.values["moving"]:
+                self.values["moving"].remove(axis)
+            self.save()
+
+    def set_position(self, axis, position):
+        # After homing: the axis is at a known position again
+        with self.lock:
+            self.values[axis] = position
+            if axis in self.values["moving"]:
+                self.values["moving"].remove(axis)
+        self.clear_suspect(axis)
+        with self.lock:
+            self.save()
+
+    def set_servo(self, pulse_width):
+        with self.lock:
+            self.values["servo"] = pulse_width
+            self.save()
+
+    def set_device(self, device):
+        with self.lock:
+            self.values["device"] = device
+            self.save()
+
+    def set_remainder(self, remainder):
+        with self.lock:
+            self.values["pcb_remainder"] = remainder
+            self.save()
+
+    def shift_device(self, offset):
+        with self.lock:
+            if self.values["device"] is not None:
+                self.values["device"] += offset
+                self.save()
+
+    def wrapped_device(self, total_ics):
+        # Device number in 1..total_ics
+        device = self.values["device"]
+        if device is None:
+            return None
+        return (device - 1) % total_ics + 1
+
+    def __getitem__(self, key):
+        return self.values[key]
+
+    def describe(self):
+        return " ".join(f"{key}={value}" for key, value in self.values.items())
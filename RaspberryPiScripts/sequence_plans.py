@@ -0,0 +1,230 @@
+from time import sleep
+from collections import OrderedDict
+import os
+import json
+from motion_scheduler import MotionPlan, SETTLE_TIME
+from motion_telemetry import telemetry
+
+# Compiles the device handling sequences in motion_sequences.json into
+# execution plans. A sequence is a list of moves:
+#
+#   {"name": "retract", "axis": "actuator", "steps": 450, "direction": 1}
+#   {"name": "swing_out", "axis": "servo", "pulse_width": 500, "after": ["retract"], "overlap": 0.15}
+#   {"name": "hold", "wait": 3, "after": ["engage"]}
+#
+# `after` names earlier moves to wait for and `overlap` lets a move start that
+# many seconds before them (see motion_scheduler.py). Axis moves wait for their
+# axis to settle (see settle_detection.py) unless `settle` fixes the time.
+# Any value may be "$name", taken from the parameters the sequence is run with
+# or from the file's "constants".
+#
+# Compiling resolves the values, plans every step train and builds its waves
+# in pigpiod (through the rig's WaveCache). Compiled plans are kept per
+# (sequence, parameters), so running "next device" again with the same step
+# count reuses the plan and its waves as they are. Plans compiled with
+# keep=False (a go-to offset that is unlikely to come again) are not kept and
+# send their step trains as temporary waves. Editing the file drops the
+# compiled plans on the next run.
+
+SEQUENCE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "motion_sequences.json")
+MAX_PLANS = 64
+
+definitions = {}  # path -> (mtime, parsed file)
+plan_cache = OrderedDict()  # (path, sequence, parameters) -> CompiledPlan
+
+
+def load_definitions(path=SEQUENCE_FILE):
+    mtime = os.path.getmtime(path)
+    if path not in definitions or definitions[path][0] != mtime:
+        with open(path) as sequence_file:
+            definitions[path] = (mtime, json.load(sequence_file))
+        for key in [key for key in plan_cache if key[0] == path]:
+            del plan_cache[key]
+    return definitions[path][1]
+
+
+class PlannedMove:
+    def __init__(self, name, axis=None, steps=0, direction=0, pulse_width=None, wait=0.0,
+                 periods=(), duration=0.0, settle=0.0, after=(), overlap=0.0, fixed_settle=False, keep=True):
+        self.name = name
+        self.axis = axis
+        self.steps = steps
+        self.direction = direction
+        self.pulse_width = pulse_width
+        self.wait = wait
+        self.periods = periods
+        self.duration = duration
+        self.settle = settle
+        self.after = tuple(after)
+        self.overlap = overlap
+        self.fixed_settle = fixed_settle
+        self.keep = keep
+
+
+class CompiledPlan:
+    def __init__(self, sequence, parameters, moves):
+        self.sequence = sequence
+        self.parameters = parameters
+        self.moves = moves
+        self.duration = expected_duration(moves)
+
+    def run(self, rig):
+        """
+        Runs the plan on the rig and blocks until every move has finished.
+        """
+        plan = MotionPlan()
+        added = {}
+        for move in self.moves:
+            added[move.name] = plan.add(
+                move_label(move),
+                rig_axis(rig, move).resources if move.axis else (),
+                move_action(rig, move),
+                duration=move.duration,
+                settle=move.settle,
+                after=[added[name] for name in move.after],
+                overlap=move.overlap,
+                settle_wait=settle_wait(rig, move),
+            )
+        plan.run()
+        for name, move in added.items():
+            moving = move.end_time - move.start_time - move.settle_time
+            telemetry.record_phase(f"{self.sequence}.{name}", moving, move.settle_time)
+
+
+def rig_axis(rig, move):
+    if move.axis == "servo":
+        return rig.servo
+    return rig.steppers[move.axis]
+
+
+def move_label(move):
+    # Same names as the hand written plans, so the timings query reads the same
+    if move.axis is None:
+        return move.name
+    if move.axis == "servo":
+        return f"servo {move.pulse_width}"
+    return f"{move.axis} {move.steps} {move.direction}"
+
+
+def move_action(rig, move):
+    if move.axis is None:
+        return lambda: sleep(move.wait)
+    axis = rig_axis(rig, move)
+    if move.axis == "servo":
+        return lambda: axis.move(move.pulse_width)
+    return lambda: axis.move(move.steps, move.direction, move.periods, move.keep)
+
+
+def settle_wait(rig, move):
+    # Axis moves detect their settling unless the file fixes the settle time
+    if move.axis is None or move.fixed_settle:
+        return None
+    return rig_axis(rig, move).settle
+
+
+def expected_duration(moves):
+    # Seconds from the first move starting to the last one settling. As in
+    # Move.wait_for_dependencies, an overlap counts back from the end of the
+    # dependency's motion (its settling is not waited for) and a move without
+    # overlap waits until the dependency has settled.
+    starts = {}
+    ends = {}
+    durations = {}
+    for move in moves:
+        start = 0.0
+        for name in move.after:
+            if move.overlap > 0:
+                start = max(start, starts[name] + max(durations[name] - move.overlap, 0.0))
+            else:
+                start = max(start, ends[name])
+        starts[move.name] = start
+        durations[move.name] = move.duration
+        ends[move.name] = start + move.duration + move.settle
+    return max(ends.values(), default=0.0)
+
+
+def resolve(value, parameters, constants):
+    if isinstance(value, str) and value.startswith("$"):
+        name = value[1:]
+        if name in parameters:
+            return parameters[name]
+        if name in constants:
+            return constants[name]
+        raise ValueError(f"No value for ${name}.")
+    return value
+
+
+def compile_move(rig, entry, parameters, constants, known, keep):
+    entry = {key: resolve(value, parameters, constants) for key, value in entry.items()}
+    name = entry.get("name")
+    if not name or name in known:
+        raise ValueError(f"Every move needs a unique name ({name!r}).")
+    after = entry.get("after", [])
+    for dependency in after:
+        if dependency not in known:
+            raise ValueError(f"{name} waits for {dependency}, which is not an earlier move.")
+    common = {"after": after, "overlap": float(entry.get("overlap", 0.0)), "fixed_settle": "settle" in entry}
+
+    axis_name = entry.get("axis")
+    if axis_name is None:
+        wait = float(entry.get("wait", 0.0))
+        return PlannedMove(name, wait=wait, duration=wait, settle=float(entry.get("settle", 0.0)), **common)
+    settle = float(entry.get("settle", SETTLE_TIME[axis_name]))
+    if axis_name == "servo":
+        return PlannedMove(name, "servo", pulse_width=int(entry["pulse_width"]), settle=settle, **common)
+    if axis_name not in rig.steppers:
+        raise ValueError(f"Unknown axis: {axis_name}")
+
+    axis = rig.steppers[axis_name]
+    steps = int(entry["steps"])
+    direction = int(entry["direction"])
+    if steps < 0:
+        steps, direction = -steps, 1 - direction
+    periods = axis.periods(steps)
+    if keep:
+        rig.waves.prepare(axis.step_pin, periods)  # Build the waves now, not when the move starts
+    return PlannedMove(name, axis_name, steps, direction, periods=periods,
+                       duration=sum(periods) / 1e6, settle=settle, keep=keep, **common)
+
+
+def compile_sequence(rig, sequence, parameters, path=SEQUENCE_FILE, keep=True):
+    data = load_definitions(path)
+    if sequence not in data["sequences"]:
+        raise ValueError(f"Unknown sequence: {sequence}")
+    definition = data["sequences"][sequence]
+    missing = set(definition.get("parameters", [])) - set(parameters)
+    if missing:
+        raise ValueError(f"{sequence} needs {', '.join(sorted(missing))}.")
+
+    constants = data.get("constants", {})
+    moves = []
+    known = set()
+    for entry in definition["moves"]:
+        move = compile_move(rig, entry, parameters, constants, known, keep)
+        moves.append(move)
+        known.add(move.name)
+    return CompiledPlan(sequence, parameters, moves)
+
+
+def plan_for(rig, sequence, path=SEQUENCE_FILE, keep=True, **parameters):
+    """
+    The compiled plan for `sequence` with these parameters, compiled on the
+    first call and reused after that. With keep=False it is compiled for
+    this run only.
+    """
+    load_definitions(path)  # Drops stale plans if the file changed
+    key = (path, sequence, tuple(sorted(parameters.items())))
+    if not keep and key not in plan_cache:
+        return compile_sequence(rig, sequence, parameters, path, keep=False)
+    if key in plan_cache:
+        plan_cache.move_to_end(key)
+        return plan_cache[key]
+    plan = compile_sequence(rig, sequence, parameters, path)
+    plan_cache[key] = plan
+    if len(plan_cache) > MAX_PLANS:
+        plan_cache.popitem(last=False)
+    return plan
+
+
+def run_sequence(rig, sequence, keep=True, **parameters):
+    plan_for(rig, sequence, keep=keep, **parameters).run(rig)
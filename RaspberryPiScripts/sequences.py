@@ -0,0 +1,175 @@
+from position_state import device_offset
+from sequence_plans import run_sequence
+import homing
+
+# Device handling sequences. Each one takes the Rig as its first argument and
+# is what used to be the body of the script of the same name. The motion
+# server calls them directly; the scripts are thin wrappers around them.
+#
+# The moves themselves are defined in motion_sequences.json; the functions
+# here add what the file cannot express (indexing, device bookkeeping).
+
+
+def connect_to_device(rig, computed_value=None):
+    rig.pcb.enable()
+
+
+def disconnect_from_device(rig, computed_value=None):
+    run_sequence(rig, "disconnect_pins")
+    rig.pcb.disable()
+
+
+def step_forward(rig, computed_value=None, count=1):
+    # `count` jog steps as a single ramped move (the control panel merges clicks)
+    rig.pcb.move(rig.pcb.microsteps * int(count), 0)
+
+
+def step_backward(rig, computed_value=None, count=1):
+    rig.pcb.move(rig.pcb.microsteps * int(count), 1)
+
+
+def test_connection(rig, computed_value=None):
+    rig.pcb.enable()
+    run_sequence(rig, "test_connection")
+
+
+def index_device(rig, steps, direction, keep=True):
+    run_sequence(rig, "index_device", keep=keep, steps=steps, direction=direction)
+
+
+def index_devices(rig, devices, computed_value):
+    # Moves `devices` devices (negative is backwards), carrying the step fraction.
+    # Only single device moves repeat often enough to keep their waves.
+    steps, remainder = rig.indexer.plan(devices, float(computed_value))
+    index_device(rig, abs(steps), 0 if steps >= 0 else 1, keep=abs(devices) == 1)
+    rig.indexer.commit(remainder)
+    return steps
+
+
+def next_device(rig, computed_value):
+    index_devices(rig, 1, computed_value)
+    rig.state.shift_device(1)
+
+
+def previous_device(rig, computed_value):
+    index_devices(rig, -1, computed_value)
+    rig.state.shift_device(-1)
+
+
+def goto_device(rig, computed_value, total_ics, target):
+    """
+    Moves straight to device `target`: one retract, one PCB move covering
+    all the devices in between (the short way around) and one re-engage.
+    """
+    total_ics = int(float(total_ics))
+    target = int(target)
+    if not 1 <= target <= total_ics:
+        raise ValueError(f"Device must be within 1..{total_ics}.")
+    rig.state.check_reliable("pcb")
+    current = rig.state.wrapped_device(total_ics)
+    if current is None:
+        raise ValueError("Current device unknown, set the device or home the axes first.")
+
+    offset = device_offset(current, target, total_ics)
+    if offset == 0:
+        return f"Already at device {target}"
+    steps = index_devices(rig, offset, computed_value)
+    rig.state.set_device(target)
+    return f"Moved from device {current} to device {target} ({offset:+d} devices, {steps:+d} steps)"
+
+
+def test_first_device(rig, computed_value):
+    steps, remainder = rig.indexer.plan(-2, float(computed_value))
+    run_sequence(rig, "test_first_device", steps=-steps)
+    rig.indexer.commit(remainder)
+    # A relative move: if the PCB was suspect, the pins may not be on device 1,
+    # so the mark stays until the operator confirms with Set Device (or homes)
+    rig.state.set_device(1)
+
+
+def disconnect_pins(rig, computed_value=None):
+    rig.pcb.enable()
+    run_sequence(rig, "disconnect_pins")
+
+
+def reconnect_pins(rig, computed_value=None):
+    rig.pcb.enable()
+    run_sequence(rig, "reconnect_pins")
+
+
+def resync(rig, computed_value, total_ics, device):
+    # Homes both axes (pins end on device 1), then goes on to `device`
+    homing.home(rig)
+    if device != 1:
+        goto_device(rig, computed_value, total_ics, device)
+
+
+def campaign(rig, computed_value, total_ics, first_device, last_device, dwell, home_every=0):
+    """
+    Tests a range of devices in one call. Unless it homes first, it starts
+    by moving from the tracked device to first_device. For every device: wait `dwell` seconds while it is tested,
+    then disconnect, index to the next device and reconnect.
+    With `home_every` set, the campaign homes first and re-homes every that
+    many devices, and after a failed move, instead of giving up.
+    Yields one progress line per step so the control panel can follow along.
+    """
+    total_ics = int(float(total_ics))
+    first_device = int(first_device)
+    last_device = int(last_device)
+    dwell = float(dwell)
+    home_every = int(float(home_every))
+    if not 1 <= first_device <= last_device <= total_ics:
+        raise ValueError(f"Device range must be within 1..{total_ics}.")
+
+    rig.stop_requested.clear()
+    count = last_device - first_device + 1
+    if home_every:
+        yield f"PROGRESS 0/{count} homing"
+        resync(rig, computed_value, total_ics, first_device)
+    elif rig.state.wrapped_device(total_ics) != first_device:
+        yield f"PROGRESS 0/{count} moving to device {first_device}"
+        goto_device(rig, computed_value, total_ics, first_device)
+    for number, device in enumerate(range(first_device, last_device + 1), start=1):
+        yield f"PROGRESS {number}/{count} device {device} testing"
+        if rig.stop_requested.wait(dwell):
+            yield f"PROGRESS {number}/{count} device {device} stopped"
+            return
+        if device == last_device:
+            yield f"PROGRESS {number}/{count} device {device} done"
+            return
+        if home_every and number % home_every == 0:
+            yield f"PROGRESS {number}/{count} device {device} re-homing"
+            resync(rig, computed_value, total_ics, device + 1)
+        else:
+            try:
+                index_devices(rig, 1, computed_value)
+                rig.state.shift_device(1)
+            except Exception as e:
+                if not home_every:
+                    raise
+                yield f"PROGRESS {number}/{count} device {device} move failed ({e}), re-homing"
+                resync(rig, computed_value, total_ics, device + 1)
+        yield f"PROGRESS {number}/{count} device {device} done"
+
+
+# Low level commands for direct control
+def step(rig, axis, steps, direction):
+    if axis not in rig.steppers:
+        raise ValueError(f"Unknown axis: {axis}")
+    rig.steppers[axis].move(int(steps), int(direction))
+
+
+def servo(rig, pulse_width):
+    rig.servo.move(int(float(pulse_width)))
+
+
+def set_device(rig, computed_value, total_ics, device):
+    # Records which IC the pins are on, e.g. after aligning by hand, and
+    # trusts the PCB position again
+    total_ics = int(float(total_ics))
+    device = int(device)
+    if not 1 <= device <= total_ics:
+        raise ValueError(f"Device must be within 1..{total_ics}.")
+    rig.state.set_device(device)
+    rig.state.clear_suspect("pcb")
+    return f"Pins recorded on device {device}"
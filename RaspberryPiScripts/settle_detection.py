@@ -0,0 +1,156 @@
+from time import sleep, monotonic
+from collections import deque
+import os
+import json
+import threading
+import pigpio
+
+# Decides how long to wait after a move before the next one may start,
+# replacing the fixed sleeps of the old scripts.
+#
+# An axis with a sensor (a limit switch or the contact-sense line of the pin
+# head) waits for the sensor to report the end position, through a pigpio
+# callback. Every reading is also fed into the axis model, which stays usable
+# if the sensor is removed or fails. An axis without a sensor waits as long as
+# its model says: base + per_unit * distance, where the distance is steps for
+# the steppers and the pulse width change for the servo. Measured settle
+# times (less the distance part) replace the base once there are enough.
+# If a sensor never reports, the wait ends after the axis timeout.
+
+MODEL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "settle_model.json")
+
+# Seconds: (base, per_unit). The defaults reproduce the old settle times for
+# the usual strokes, so an uncalibrated rig behaves as before.
+DEFAULT_MODEL = {
+    "actuator": (0.2, 0.0),
+    "pcb": (0.2, 0.0),
+    "servo": (0.05, 0.0008),
+}
+
+# Longest wait for a sensor before giving up on it
+SETTLE_TIMEOUT = {
+    "actuator": 1.0,
+    "pcb": 1.0,
+    "servo": 0.5,
+}
+
+MIN_SAMPLES = 10    # Measurements needed before they replace the model base
+SAMPLE_MARGIN = 1.25  # Margin on the slowest recent measurement
+GLITCH_FILTER_US = 2000  # Ignore contact bounce shorter than this
+
+
+class SettleSensor:
+    """
+    A digital input that reads `active_level` when its axis is at the end
+    position, e.g. the pins touching the IC. Moves in `seated_direction` end
+    with the sensor active, moves the other way with it released.
+    """
+
+    def __init__(self, pi, gpio, active_level=0, seated_direction=0, pull=pigpio.PUD_UP):
+        self.pi = pi
+        self.gpio = gpio
+        self.active_level = active_level
+        self.seated_direction = seated_direction
+        self.level = None
+        self.changed = threading.Condition()
+        pi.set_mode(gpio, pigpio.INPUT)
+        pi.set_pull_up_down(gpio, pull)
+        pi.set_glitch_filter(gpio, GLITCH_FILTER_US)
+        self.callback = pi.callback(gpio, pigpio.EITHER_EDGE, self.edge)
+
+    def edge(self, gpio, level, tick):
+        with self.changed:
+            self.level = level
+            self.changed.notify_all()
+
+    def wait(self, direction, timeout):
+        # True once the sensor shows the end position for a move in `direction`
+        expected = self.active_level if direction == self.seated_direction else 1 - self.active_level
+        deadline = monotonic() + timeout
+        with self.changed:
+            self.level = self.pi.read(self.gpio)
+            while self.level != expected:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    return False
+                self.changed.wait(remaining)
+        return True
+
+    def cancel(self):
+        self.callback.cancel()
+
+
+class SettleMonitor:
+    def __init__(self, pi, sensors=None, path=MODEL_FILE):
+        self.path = path
+        self.model = dict(DEFAULT_MODEL)
+        self.samples = {axis: deque(maxlen=50) for axis in DEFAULT_MODEL}
+        self.timeouts = {axis: 0 for axis in DEFAULT_MODEL}
+        self.sensors = {}
+        self.lock = threading.Lock()
+        for axis, settings in (sensors or {}).items():
+            self.sensors[axis] = SettleSensor(pi, **settings)
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as model_file:
+                data = json.load(model_file)
+        except (OSError, ValueError):
+            return  # Not calibrated yet, keep the defaults
+        for axis, values in data.get("model", {}).items():
+            self.model[axis] = tuple(values)
+        for axis, samples in data.get("samples", {}).items():
+            self.samples.setdefault(axis, deque(maxlen=50)).extend(samples)
+
+    def save(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as model_file:
+            json.dump({
+                "model": self.model,
+                "samples": {axis: list(samples) for axis, samples in self.samples.items()},
+            }, model_file)
+        os.replace(temp_path, self.path)
+
+    def estimate(self, axis, distance):
+        # Seconds the axis needs to settle after a move of `distance`
+        base, per_unit = self.model.get(axis, (0.0, 0.0))
+        samples = self.samples.get(axis)
+        if samples and len(samples) >= MIN_SAMPLES:
+            base = max(samples) * SAMPLE_MARGIN
+        return base + per_unit * abs(distance)
+
+    def record(self, axis, seconds):
+        with self.lock:
+            self.samples.setdefault(axis, deque(maxlen=50)).append(round(seconds, 4))
+            self.save()
+
+    def wait(self, axis, distance, direction=0):
+        """
+        Blocks until the axis has settled after its last move. Returns
+        (seconds waited, how it was decided: "sensor", "model" or "timeout").
+        """
+        start = monotonic()
+        sensor = self.sensors.get(axis)
+        if sensor is None:
+            sleep(self.estimate(axis, distance))
+            return monotonic() - start, "model"
+        if sensor.wait(direction, SETTLE_TIMEOUT.get(axis, 1.0)):
+            elapsed = monotonic() - start
+            self.record(axis, elapsed - self.model.get(axis, (0.0, 0.0))[1] * abs(distance))
+            return elapsed, "sensor"
+        with self.lock:
+            self.timeouts[axis] = self.timeouts.get(axis, 0) + 1
+        return monotonic() - start, "timeout"
+
+    def export(self):
+        # Sensor waits that ran into SETTLE_TIMEOUT, for the metrics query
+        lines = ["# TYPE sundial_settle_timeouts_total counter"]
+        with self.lock:
+            for axis, count in sorted(self.timeouts.items()):
+                lines.append(f'sundial_settle_timeouts_total{{axis="{axis}"}} {count}')
+        return "\n".join(lines)
+
+    def close(self):
+        for sensor in self.sensors.values():
+            sensor.cancel()
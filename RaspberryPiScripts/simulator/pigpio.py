@@ -0,0 +1,375 @@
+import os
+import json
+import atexit
+import threading
+from bisect import bisect_right
+from collections import deque
+from time import monotonic
+
+# Simulated pigpio for running the Raspberry Pi code on an ordinary machine.
+# Put this directory first on the path and every script picks it up in place
+# of the real module:
+#
+#     PYTHONPATH=RaspberryPiScripts/simulator python3 RaspberryPiScripts/next_device.py 25
+#
+# Every call is recorded with a timestamp in `call_log`. Step pulses (plain
+# writes and waves) are counted into `positions` for both steppers, using the
+# direction pin level at the time (0 = +1 step, 1 = -1 step), and the servo
+# position is its last pulse width. Waves take as long as their pulses add up
+# to, so wave_tx_busy behaves like the real DMA engine.
+#
+# Environment variables:
+#   SIM_PIGPIO_LOG    append the call log to this file (JSON lines) on exit
+#   SIM_PIGPIO_STATE  load/save axis positions here so they survive between runs
+
+OUTPUT = 1
+INPUT = 0
+PUD_OFF = 0
+PUD_DOWN = 1
+PUD_UP = 2
+RISING_EDGE = 0
+FALLING_EDGE = 1
+EITHER_EDGE = 2
+TIMEOUT = 2
+WAVE_MODE_ONE_SHOT = 0
+WAVE_MODE_REPEAT = 1
+WAVE_MODE_ONE_SHOT_SYNC = 2
+WAVE_NOT_FOUND = 9998
+NO_TX_WAVE = 9999
+
+MAX_WAVE_PULSES = 12000
+MAX_LOG_ENTRIES = 100000
+
+# Step/direction pins of each simulated axis (same wiring as the rig)
+AXES = {
+    "actuator": {"step": 21, "dir": 20},
+    "pcb": {"step": 23, "dir": 22},
+}
+SERVO_PIN = 11
+
+call_log = deque(maxlen=MAX_LOG_ENTRIES)  # (seconds since start, call, args)
+positions = {"actuator": 0, "pcb": 0, "servo": 0}
+step_counts = {"actuator": 0, "pcb": 0}  # Total steps regardless of direction
+levels = {}  # Current level of every pin that was written or driven
+state_lock = threading.Lock()
+start_time = monotonic()
+
+
+class pulse:
+    def __init__(self, gpio_on, gpio_off, delay):
+        self.gpio_on = gpio_on
+        self.gpio_off = gpio_off
+        self.delay = delay
+
+
+class _callback:
+    def __init__(self, owner, gpio, edge, func):
+        self.owner = owner
+        self.gpio = gpio
+        self.edge = edge
+        self.func = func
+        self.count = 0  # Edges seen, for callbacks without a function
+
+    def tally(self):
+        return self.count
+
+    def reset_tally(self):
+        self.count = 0
+
+    def cancel(self):
+        if self in self.owner.callbacks:
+            self.owner.callbacks.remove(self)
+
+
+def record(name, *args):
+    call_log.append((monotonic() - start_time, name, args))
+
+
+def axis_for_step_pin(gpio):
+    for axis, pins in AXES.items():
+        if pins["step"] == gpio:
+            return axis
+    return None
+
+
+def count_steps(gpio, count):
+    axis = axis_for_step_pin(gpio)
+    if axis is None or count == 0:
+        return
+    direction = -1 if levels.get(AXES[axis]["dir"], 0) else 1
+    with state_lock:
+        positions[axis] += direction * count
+        step_counts[axis] += count
+
+
+def load_state():
+    path = os.environ.get("SIM_PIGPIO_STATE")
+    if path and os.path.exists(path):
+        with open(path) as state_file:
+            positions.update(json.load(state_file))
+
+
+def save_state():
+    path = os.environ.get("SIM_PIGPIO_STATE")
+    if path:
+        with open(path, "w") as state_file:
+            json.dump(positions, state_file)
+
+
+def save_log():
+    path = os.environ.get("SIM_PIGPIO_LOG")
+    if path:
+        with open(path, "a") as log_file:
+            for entry in call_log:
+                log_file.write(json.dumps({"t": entry[0], "call": entry[1], "args": list(entry[2])}) + "\n")
+
+
+atexit.register(save_log)
+
+
+class pi:
+    def __init__(self, host="localhost", port=8888, show_errors=True):
+        self.connected = True
+        self.modes = {}
+        self.pwm = {}
+        self.waves = {}
+        self.next_wave_id = 0
+        self.new_wave = []
+        self.busy_until = 0.0
+        self.queued = []  # (wave_id, start, end) of waves sent with wave_send_using_mode
+        self.pending_steps = []  # (step pin, direction, start, step times) of waves still going out
+        self.callbacks = []
+        load_state()
+        record("pi", host, port)
+
+    # Basic GPIO
+    def set_mode(self, gpio, mode):
+        record("set_mode", gpio, mode)
+        self.modes[gpio] = mode
+        return 0
+
+    def get_mode(self, gpio):
+        return self.modes.get(gpio, INPUT)
+
+    def set_pull_up_down(self, gpio, pud):
+        record("set_pull_up_down", gpio, pud)
+        if gpio not in levels:
+            levels[gpio] = 1 if pud == PUD_UP else 0
+        return 0
+
+    def set_glitch_filter(self, user_gpio, steady):
+        record("set_glitch_filter", user_gpio, steady)
+        return 0
+
+    def read(self, gpio):
+        return levels.get(gpio, 0)
+
+    def write(self, gpio, level):
+        record("write", gpio, level)
+        previous = levels.get(gpio, 0)
+        levels[gpio] = level
+        if level and not previous:
+            count_steps(gpio, 1)
+        self.fire_callbacks(gpio, previous, level)
+        return 0
+
+    # Servo and PWM
+    def set_servo_pulsewidth(self, user_gpio, pulsewidth):
+        record("set_servo_pulsewidth", user_gpio, pulsewidth)
+        if user_gpio == SERVO_PIN:
+            positions["servo"] = pulsewidth
+        return 0
+
+    def get_servo_pulsewidth(self, user_gpio):
+        return positions["servo"] if user_gpio == SERVO_PIN else 0
+
+    def set_PWM_frequency(self, user_gpio, frequency):
+        record("set_PWM_frequency", user_gpio, frequency)
+        return frequency
+
+    def set_PWM_dutycycle(self, user_gpio, dutycycle):
+        record("set_PWM_dutycycle", user_gpio, dutycycle)
+        self.pwm[user_gpio] = dutycycle
+        return 0
+
+    def get_PWM_dutycycle(self, user_gpio):
+        return self.pwm.get(user_gpio, 0)
+
+    # Waves
+    def wave_clear(self):
+        record("wave_clear")
+        self.waves = {}
+        self.new_wave = []
+        return 0
+
+    def wave_add_new(self):
+        record("wave_add_new")
+        self.new_wave = []
+        return 0
+
+    def wave_add_generic(self, pulses):
+        record("wave_add_generic", len(pulses))
+        self.new_wave += pulses
+        if len(self.new_wave) > MAX_WAVE_PULSES:
+            return -36  # PI_TOO_MANY_PULSES
+        return len(self.new_wave)
+
+    def wave_create(self):
+        record("wave_create", len(self.new_wave))
+        wave_id = self.next_wave_id
+        self.next_wave_id += 1
+        self.waves[wave_id] = self.new_wave
+        self.new_wave = []
+        return wave_id
+
+    def wave_delete(self, wave_id):
+        record("wave_delete", wave_id)
+        self.waves.pop(wave_id, None)
+        return 0
+
+    def wave_get_max_pulses(self):
+        return MAX_WAVE_PULSES
+
+    def wave_send_once(self, wave_id):
+        record("wave_send_once", wave_id)
+        self.play([(wave_id, 1)])
+        return len(self.waves.get(wave_id, []))
+
+    def wave_send_using_mode(self, wave_id, mode):
+        # The sync mode starts the wave once the one in progress has finished
+        record("wave_send_using_mode", wave_id, mode)
+        now = monotonic()
+        start = max(now, self.busy_until) if mode == WAVE_MODE_ONE_SHOT_SYNC else now
+        self.queued = [entry for entry in self.queued if entry[2] > now]
+        self.play([(wave_id, 1)], start)
+        self.queued.append((wave_id, start, self.busy_until))
+        return len(self.waves.get(wave_id, []))
+
+    def wave_tx_at(self):
+        now = monotonic()
+        for wave_id, start, end in self.queued:
+            if start <= now < end:
+                return wave_id
+        return WAVE_NOT_FOUND if self.wave_tx_busy() else NO_TX_WAVE
+
+    def wave_chain(self, data):
+        record("wave_chain", list(data))
+        self.play(parse_chain(list(data)))
+        return 0
+
+    def wave_tx_busy(self):
+        return 1 if monotonic() < self.busy_until else 0
+
+    def wave_tx_stop(self):
+        record("wave_tx_stop")
+        self.take_back_steps(monotonic())
+        self.busy_until = 0.0
+        self.queued = []
+        return 0
+
+    def take_back_steps(self, now):
+        # A stopped wave never sends its remaining steps, undo their counts
+        for gpio, direction, start, times in self.pending_steps:
+            remaining = len(times) - bisect_right(times, (now - start) * 1e6)
+            if remaining <= 0:
+                continue
+            axis = axis_for_step_pin(gpio)
+            with state_lock:
+                positions[axis] -= direction * remaining
+                step_counts[axis] -= remaining
+            for cb in self.callbacks:
+                if cb.gpio == gpio and cb.func is None and cb.edge != FALLING_EDGE:
+                    cb.count -= remaining
+        self.pending_steps = []
+
+    def play(self, waves, start=None):
+        # Steps are counted when the wave is sent, the timing comes from
+        # busy_until. The time of every step is kept so wave_tx_stop can take
+        # back the ones that would not have gone out yet.
+        now = monotonic()
+        start = now if start is None else start
+        self.pending_steps = [entry for entry in self.pending_steps if entry[2] + entry[3][-1] / 1e6 > now]
+        duration_us = 0
+        step_times = {pins["step"]: [] for pins in AXES.values()}
+        for wave_id, repeat in waves:
+            pulses = self.waves.get(wave_id, [])
+            for _ in range(repeat):
+                for p in pulses:
+                    for gpio, times in step_times.items():
+                        if p.gpio_on & (1 << gpio):
+                            times.append(duration_us)
+                    duration_us += p.delay
+        start_tick = int((start - start_time) * 1e6)
+        for gpio, times in step_times.items():
+            count_steps(gpio, len(times))
+            for cb in list(self.callbacks):
+                if cb.gpio == gpio and cb.edge != FALLING_EDGE:
+                    if cb.func is None:
+                        cb.count += len(times)
+                    else:
+                        # Every step edge, with the tick it goes out at
+                        for time_us in times:
+                            cb.func(gpio, 1, (start_tick + time_us) & 0xFFFFFFFF)
+            if times:
+                direction = -1 if levels.get(AXES[axis_for_step_pin(gpio)]["dir"], 0) else 1
+                self.pending_steps.append((gpio, direction, start, times))
+        self.busy_until = start + duration_us / 1e6
+
+    # Callbacks
+    def callback(self, user_gpio, edge=RISING_EDGE, func=None):
+        record("callback", user_gpio, edge)
+        cb = _callback(self, user_gpio, edge, func)
+        self.callbacks.append(cb)
+        return cb
+
+    def fire_callbacks(self, gpio, previous, level):
+        if previous == level:
+            return
+        for cb in list(self.callbacks):
+            if cb.gpio != gpio:
+                continue
+            if cb.edge == EITHER_EDGE or (cb.edge == RISING_EDGE) == bool(level):
+                if cb.func is None:
+                    cb.count += 1
+                else:
+                    cb.func(gpio, level, self.get_current_tick())
+
+    def set_input(self, gpio, level):
+        # Simulation only: drive an input pin (limit switch, trigger line)
+        previous = levels.get(gpio, 0)
+        levels[gpio] = level
+        self.fire_callbacks(gpio, previous, level)
+
+    def get_current_tick(self):
+        return int((monotonic() - start_time) * 1e6) & 0xFFFFFFFF
+
+    def stop(self):
+        record("stop")
+        self.connected = False
+        save_state()
+
+
+def parse_chain(data):
+    """
+    Expands a wave_chain command list into (wave_id, repeat) pairs,
+    following the loop markers (255 0 ... 255 1 x y) and delays (255 2 x y).
+    """
+    stack = [[]]
+    i = 0
+    while i < len(data):
+        if data[i] == 255:
+            command = data[i + 1]
+            if command == 0:
+                stack.append([])
+                i += 2
+            elif command == 1:
+                repeat = data[i + 2] + 256 * data[i + 3]
+                body = stack.pop()
+                stack[-1] += [(wave_id, count * repeat) for wave_id, count in body]
+                i += 4
+            else:
+                i += 4  # Delays and forever loops are not simulated
+        else:
+            stack[-1].append((data[i], 1))
+            i += 1
+    return stack[0]
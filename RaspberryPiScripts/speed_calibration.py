@@ -0,0 +1,112 @@
+from motion_profiles import MotionProfile, save_profile, check_profile, step_periods, scaled_profile
+import sequence_plans
+from sequence_plans import run_sequence
+
+# Finds the fastest profile each stepper axis can run without losing steps.
+#
+# The axis is referenced on its home switch and backed off BACKOFF steps. Each
+# trial then runs TRIAL_STEPS out and TRIAL_STEPS back with the trial profile,
+# after which a slow approach counts the steps to the switch. Anything other
+# than BACKOFF (within TOLERANCE) means steps were lost. Trials scale the max
+# velocity and the acceleration together, from the current profile upwards,
+# until one fails or MAX_FACTOR is reached. The last reliable factor, less
+# SAFETY_MARGIN, is stored in axis_profiles.json and loaded at startup.
+#
+# The PCB is only calibrated with the pins disconnected, so they are not
+# dragged across the board. Calibration leaves the axis off its tracked
+# position, so afterwards it is marked suspect (and the PCB step fraction
+# reset) until it is homed or the device is set again.
+
+TRIAL_STEPS = {"actuator": 400, "pcb": 200}
+BACKOFF = 20         # Steps between the switch and the start of each trial
+TOLERANCE = 1        # Steps of difference still counted as no loss
+REPEATS = 3          # Every trial has to pass this many times
+FACTOR_STEP = 0.25   # Increase of the speed factor per trial
+MAX_FACTOR = 4.0
+SAFETY_MARGIN = 0.8  # Fraction of the fastest reliable speed that is stored
+SEEK_LIMIT = 5000    # Steps to look for the switch before giving up
+
+
+def trial_profile(profile, factor):
+    return MotionProfile(
+        start_velocity=profile.start_velocity,
+        max_velocity=profile.max_velocity * factor,
+        acceleration=profile.acceleration * factor,
+        jerk=profile.jerk * factor,
+    )
+
+
+def crawl(axis, steps, direction):
+    # Constant speed at the start velocity, which never loses steps
+    axis.move(steps, direction, (int(round(1e6 / axis.profile.start_velocity)),) * steps)
+
+
+def verify(axis):
+    """
+    Steps lost by the last trial: approaches the switch slowly and compares
+    the distance with BACKOFF. Leaves the axis BACKOFF steps off the switch.
+    """
+    found = axis.seek_home(BACKOFF + SEEK_LIMIT)
+    if found is None:
+        raise RuntimeError(f"{axis.name} home switch not found, check the wiring.")
+    crawl(axis, BACKOFF, 1 - axis.home_direction)
+    return abs(found - BACKOFF)
+
+
+def run_trial(axis, profile, steps):
+    # One trial out and back, then count the steps lost
+    periods = step_periods(steps, scaled_profile(profile, axis.microsteps))
+    axis.move(steps, 1 - axis.home_direction, periods)
+    axis.move(steps, axis.home_direction, periods)
+    return verify(axis)
+
+
+def calibrate(rig, axis_name):
+    """
+    Calibrates one stepper axis and stores the result. Yields a progress line
+    per trial so the control panel can follow along.
+    """
+    if axis_name not in rig.steppers:
+        raise ValueError(f"Unknown axis: {axis_name}")
+    axis = rig.steppers[axis_name]
+    base = MotionProfile(*(value / axis.microsteps for value in axis.profile))  # Back to full steps
+    steps = TRIAL_STEPS.get(axis_name, 200) * axis.microsteps
+
+    if axis.home_pin is None:
+        raise ValueError(f"No home switch fitted on the {axis_name} axis.")
+    if axis_name == "pcb":
+        yield "PROGRESS pcb disconnecting the pins"
+        run_sequence(rig, "disconnect_pins")
+    best = None
+    try:
+        yield f"PROGRESS {axis_name} referencing on the home switch"
+        if axis.seek_home(SEEK_LIMIT) is None:
+            raise RuntimeError(f"{axis_name} home switch not found, check the wiring.")
+        crawl(axis, BACKOFF, 1 - axis.home_direction)
+
+        factor = 1.0
+        while factor <= MAX_FACTOR:
+            profile = trial_profile(base, factor)
+            lost = max(run_trial(axis, profile, steps) for _ in range(REPEATS))
+            passed = lost <= TOLERANCE
+            yield (f"PROGRESS {axis_name} x{factor:.2f} {profile.max_velocity:.0f} steps/s "
+                   f"{profile.acceleration:.0f} steps/s^2 lost {lost} {'ok' if passed else 'FAIL'}")
+            if not passed:
+                break
+            best = factor
+            factor += FACTOR_STEP
+    finally:
+        rig.state.lose_reference(axis_name)
+        if axis_name == "pcb":
+            rig.indexer.commit(0.0)
+
+    if best is None:
+        raise RuntimeError(f"{axis_name} loses steps even at its current profile, not storing anything.")
+    # Never slower than the profile it started from, which is known to work
+    stored = trial_profile(base, max(best * SAFETY_MARGIN, 1.0))
+    check_profile(stored)
+    save_profile(axis_name, stored)
+    axis.set_profile(stored)
+    sequence_plans.plan_cache.clear()  # Compiled plans hold the old step periods
+    yield (f"Stored {axis_name}: {stored.max_velocity:.0f} steps/s, {stored.acceleration:.0f} steps/s^2. "
+           "Home the axes or set the device before moving between devices.")
@@ -0,0 +1,197 @@
+from time import sleep
+import pigpio
+
+# Builds stepper pulse trains as pigpio waves so the step timing comes from
+# the DMA engine instead of Python sleep calls. A move is described by a list
+# of step periods in microseconds (one entry per step). Runs of equal periods
+# become a single one-step wave repeated with a wave_chain loop, everything
+# else is packed into blocks of individual pulses.
+
+MIN_LOOP_STEPS = 8     # Shorter runs are cheaper to send as plain pulses
+MAX_LOOP_COUNT = 65535  # Largest repeat count a single wave_chain loop accepts
+MAX_BLOCK_STEPS = 2000  # Keeps each block wave well under the pigpio pulse limit
+CACHE_PULSES = 6000     # Pulses the wave cache may keep in pigpiod (about half of its memory)
+CACHE_WAVES = 200       # pigpiod allows 250 waves in total
+
+
+def step_pulses(step_pin, period_us):
+    # One step: pin high for half the period, low for the other half
+    high = period_us // 2
+    return [
+        pigpio.pulse(1 << step_pin, 0, high),
+        pigpio.pulse(0, 1 << step_pin, period_us - high),
+    ]
+
+
+def group_periods(periods_us):
+    # Run-length encode the step periods as [period, count] pairs
+    runs = []
+    for period in periods_us:
+        if runs and runs[-1][0] == period:
+            runs[-1][1] += 1
+        else:
+            runs.append([period, 1])
+    return runs
+
+
+def create_wave(pi, pulses):
+    pi.wave_add_new()
+    pi.wave_add_generic(pulses)
+    wave_id = pi.wave_create()
+    if wave_id < 0:
+        raise RuntimeError(f"pigpio could not create wave ({wave_id})")
+    return wave_id
+
+
+def build_step_train(pi, step_pin, periods_us):
+    """
+    Turns a list of step periods into pigpio waves.
+    Returns (chain, wave_ids); the caller sends the chain and deletes the waves.
+    If pigpiod runs out of wave memory, the waves already built are deleted
+    before the RuntimeError is raised.
+    """
+    chain = []
+    wave_ids = []
+    block = []
+
+    def flush_block():
+        if block:
+            wave_id = create_wave(pi, block)
+            wave_ids.append(wave_id)
+            chain.append(wave_id)
+            del block[:]
+
+    try:
+        for period, count in group_periods([int(p) for p in periods_us]):
+            if count >= MIN_LOOP_STEPS:
+                flush_block()
+                wave_id = create_wave(pi, step_pulses(step_pin, period))
+                wave_ids.append(wave_id)
+                while count > 0:
+                    repeat = min(count, MAX_LOOP_COUNT)
+                    chain += [255, 0, wave_id, 255, 1, repeat & 255, repeat >> 8]
+                    count -= repeat
+            else:
+                for _ in range(count):
+                    block += step_pulses(step_pin, period)
+                    if len(block) >= 2 * MAX_BLOCK_STEPS:
+                        flush_block()
+        flush_block()
+    except RuntimeError:
+        delete_waves(pi, wave_ids)
+        raise
+    return chain, wave_ids
+
+
+def train_pulses(periods_us):
+    # Pulses build_step_train puts into pigpiod for this train
+    return sum(2 if count >= MIN_LOOP_STEPS else 2 * count for _, count in group_periods(periods_us))
+
+
+def delete_waves(pi, wave_ids):
+    for wave_id in wave_ids:
+        pi.wave_delete(wave_id)
+
+
+def wait_for_wave(pi, expected_s=0.0):
+    # Sleep through most of the move, then poll for the tail
+    if expected_s > 0.01:
+        sleep(expected_s - 0.01)
+    while pi.wave_tx_busy():
+        sleep(0.001)
+
+
+def send_chain(pi, chain, duration_s):
+    # Sends a prepared chain and blocks until the last pulse is out
+    try:
+        pi.wave_chain(chain)
+        wait_for_wave(pi, duration_s)
+    finally:
+        pi.wave_tx_stop()
+
+
+class WaveCache:
+    """
+    Keeps the waves of recent step trains in pigpiod so a repeated move (the
+    same actuator stroke, the same device index) is sent without rebuilding
+    them. Keyed by (step_pin, periods).
+
+    pigpiod only reuses the memory of a deleted wave once every later wave is
+    deleted too, so single trains are never evicted from the middle: when the
+    pulse or wave budget is used up the whole cache is cleared and refilled
+    as moves come in. One-off trains (a jog count, a go-to offset) are built
+    as temporary waves on top of the cached ones and deleted straight after
+    the move, which leaves no hole behind. If pigpiod still runs out of wave
+    memory, the cache is cleared and the build tried once more.
+    """
+
+    def __init__(self, pi, max_pulses=CACHE_PULSES, max_waves=CACHE_WAVES):
+        self.pi = pi
+        self.max_pulses = max_pulses
+        self.max_waves = max_waves
+        self.trains = {}  # key -> (chain, wave_ids)
+        self.pulses = 0
+        self.waves = 0
+        self.hits = 0
+        self.misses = 0
+        self.clears = 0  # Times the budget ran out and everything was deleted
+
+    def prepare(self, step_pin, periods_us):
+        # Returns the chain for this train, building its waves if needed
+        key = (step_pin, tuple(periods_us))
+        if key in self.trains:
+            self.hits += 1
+            return self.trains[key][0]
+        self.misses += 1
+        pulses = train_pulses(periods_us)
+        if self.pulses + pulses > self.max_pulses or self.waves + len(group_periods(periods_us)) > self.max_waves:
+            self.clear()
+            self.clears += 1
+        chain, wave_ids = self.build(step_pin, periods_us)
+        self.trains[key] = (chain, wave_ids)
+        self.pulses += pulses
+        self.waves += len(wave_ids)
+        return chain
+
+    def build(self, step_pin, periods_us):
+        try:
+            return build_step_train(self.pi, step_pin, periods_us)
+        except RuntimeError:
+            if not self.trains:
+                raise
+            self.clear()
+            self.clears += 1
+            return build_step_train(self.pi, step_pin, periods_us)
+
+    def send(self, step_pin, periods_us, keep=True):
+        # keep=False (or a train too big to keep) sends temporary waves
+        if not periods_us:
+            return
+        if keep and train_pulses(periods_us) <= self.max_pulses:
+            chain = self.prepare(step_pin, periods_us)
+            send_chain(self.pi, chain, sum(periods_us) / 1e6)
+            return
+        chain, wave_ids = self.build(step_pin, periods_us)
+        try:
+            send_chain(self.pi, chain, sum(periods_us) / 1e6)
+        finally:
+            delete_waves(self.pi, wave_ids)
+
+    def export(self):
+        # Cache lookups for the metrics query: misses cost a wave build before the move
+        return "\n".join([
+            "# TYPE sundial_wave_cache_hits_total counter",
+            f"sundial_wave_cache_hits_total {self.hits}",
+            "# TYPE sundial_wave_cache_misses_total counter",
+            f"sundial_wave_cache_misses_total {self.misses}",
+            "# TYPE sundial_wave_cache_clears_total counter",
+            f"sundial_wave_cache_clears_total {self.clears}",
+        ])
+
+    def clear(self):
+        # Deletes every cached wave, so pigpiod's wave memory is free in one piece
+        for chain, wave_ids in self.trains.values():
+            delete_waves(self.pi, wave_ids)
+        self.trains.clear()
+        self.pulses = 0
+        self.waves = 0
@@ -0,0 +1,316 @@
+from time import sleep, monotonic
+import threading
+import types
+import sys
+import pigpio
+from stepper_waves import WaveCache, build_step_train, delete_waves, wait_for_wave
+from motion_profiles import load_profiles, step_periods, scaled_profile
+from indexing import DeviceIndexer, PCB_MICROSTEPS
+from position_state import AxisState
+from settle_detection import SettleMonitor
+from motion_telemetry import telemetry
+
+# Shared motor control for the rig. One Rig owns the pigpio connection, the
+# pin setup and an object per axis; the device handling sequences in
+# sequences.py are built from these, and both the motion server and the
+# individual scripts use them.
+
+# Motor 1 (Original motor): the actuator that pushes the pins onto the IC
+DIR1 = 20     # Direction GPIO Pin for motor 1
+STEP1 = 21    # Step GPIO Pin for motor 1
+ENABLE1 = 12  # Enable GPIO Pin for motor 1
+
+# Motor 2 (New motor): turns the PCB from one IC to the next
+DIR2 = 22     # Direction GPIO Pin for motor 2
+STEP2 = 23    # Step GPIO Pin for motor 2
+ENABLE2 = 24  # Enable GPIO Pin for motor 2
+
+SERVO_PWM = 11  # PWM GPIO Pin for the servo motor
+
+# Contact-sense line of the pin head (pulled up, low while the pins touch the
+# IC). None while it is not fitted; settling then follows the calibrated model.
+CONTACT_SENSE = None
+
+# Home/limit switches (pulled up, low while pressed). None while not fitted.
+ACTUATOR_HOME = None  # At the retracted end of the actuator stroke
+PCB_HOME = None       # Index mark on the PCB carrier
+HOME_ACTIVE_LEVEL = 0
+
+# Trigger mode (trigger_mode.py): input pulled low by the test equipment when a
+# test ends, and an output raised while the next device is seated and ready.
+# None while not wired.
+TEST_TRIGGER = None
+READY_OUTPUT = None
+
+SERVO_FULL_SWING = 290  # Pulse width change between swung out (500) and in (790)
+
+
+class StepperAxis:
+    """
+    A step/direction driver. The enable input is active low on both drivers.
+    `hold_after_move` keeps the driver enabled once the move is done so the
+    motor holds its position (the PCB must not drift between devices).
+    """
+
+    def __init__(self, rig, name, dir_pin, step_pin, enable_pin, profile,
+                 hold_after_move=False, microsteps=1, enable_level=0, home_pin=None, home_direction=1):
+        self.rig = rig
+        self.name = name
+        self.dir_pin = dir_pin
+        self.step_pin = step_pin
+        self.enable_pin = enable_pin
+        self.home_pin = home_pin
+        self.home_direction = home_direction
+        self.profile = scaled_profile(profile, microsteps)
+        self.hold_after_move = hold_after_move
+        self.microsteps = microsteps
+        self.enable_level = enable_level
+        self.resources = (name, "wave")  # Both steppers share the one wave generator
+        self.last_move = (0, 0)  # (steps, direction) of the last move, for settling
+        self.armed = None  # Move prepared by arm(), see trigger_mode.py
+
+    def setup(self):
+        pi = self.rig.pi
+        pi.set_mode(self.dir_pin, pigpio.OUTPUT)
+        pi.set_mode(self.step_pin, pigpio.OUTPUT)
+        pi.set_mode(self.enable_pin, pigpio.OUTPUT)
+        if self.home_pin is not None:
+            pi.set_mode(self.home_pin, pigpio.INPUT)
+            pi.set_pull_up_down(self.home_pin, pigpio.PUD_UP)
+            pi.set_glitch_filter(self.home_pin, 2000)  # Ignore switch bounce
+
+    def set_profile(self, profile):
+        # `profile` in full steps, as stored by speed_calibration.py
+        self.profile = scaled_profile(profile, self.microsteps)
+
+    def enable(self):
+        self.rig.pi.write(self.enable_pin, self.enable_level)
+
+    def disable(self):
+        self.rig.pi.write(self.enable_pin, 1 - self.enable_level)
+
+    def periods(self, steps):
+        return step_periods(steps, self.profile)
+
+    def move(self, steps, direction, periods=None, keep=False):
+        # The whole pulse train goes out as one pigpio wave that ramps up to
+        # cruise speed and back down (see motion_profiles.py). `periods` lets
+        # a compiled plan pass in the train it already planned, and `keep`
+        # leaves its waves in the wave cache for the next run.
+        if periods is None:
+            periods = self.periods(steps)
+        pi = self.rig.pi
+        armed = self.armed
+        if armed is not None and armed.started is not None and \
+                (armed.steps, armed.direction, armed.periods) == (steps, direction, tuple(periods)):
+            # Started by fire() already, only wait for it to finish
+            self.armed = None
+            try:
+                wait_for_wave(pi, armed.started + sum(periods) / 1e6 - monotonic())
+            finally:
+                pi.wave_tx_stop()
+                telemetry.end_move(armed.recorder, self.name, periods, monotonic() - armed.started)
+        else:
+            self.disarm()
+            pi.write(self.dir_pin, direction)
+            self.enable()
+            self.rig.state.begin_move(self.name)
+            recorder = telemetry.start_move(pi, self.step_pin)
+            start = monotonic()
+            try:
+                self.rig.waves.send(self.step_pin, periods, keep)
+            finally:
+                telemetry.end_move(recorder, self.name, periods, monotonic() - start)
+        self.rig.state.end_move(self.name, steps, direction)
+        self.last_move = (steps, direction)
+        if not self.hold_after_move:
+            self.disable()
+
+    def arm(self, steps, direction, periods):
+        """
+        Does everything a move needs before its first step (direction, driver
+        enable, saving the state, the step recorder, the waves), so fire() only
+        has to start the chain. The move() of the same train then waits for
+        the running chain instead of sending it.
+        """
+        self.disarm()
+        pi = self.rig.pi
+        pi.write(self.dir_pin, direction)
+        self.enable()
+        self.rig.state.begin_move(self.name)
+        chain = self.rig.waves.prepare(self.step_pin, periods)
+        self.armed = types.SimpleNamespace(
+            steps=steps, direction=direction, periods=tuple(periods), chain=chain,
+            recorder=telemetry.start_move(pi, self.step_pin), started=None,
+        )
+
+    def fire(self):
+        # Safe to call from a pigpio callback: one call to pigpiod
+        self.rig.pi.wave_chain(self.armed.chain)
+        self.armed.started = monotonic()
+
+    def disarm(self):
+        armed, self.armed = self.armed, None
+        if armed is None:
+            return
+        armed.recorder.stop()
+        if armed.started is None:
+            self.rig.state.end_move(self.name, 0, armed.direction)  # Never started
+            if not self.hold_after_move:
+                self.disable()
+        else:
+            self.rig.pi.wave_tx_stop()  # Stopped part way: stays marked as moving
+
+    def settle(self):
+        # Waits until the last move has settled, returns (seconds, source)
+        steps, direction = self.last_move
+        return self.rig.settle.wait(self.name, steps, direction)
+
+    def at_home(self):
+        return self.home_pin is not None and self.rig.pi.read(self.home_pin) == HOME_ACTIVE_LEVEL
+
+    def seek_home(self, max_steps, direction=None, periods=None):
+        """
+        Runs towards the home switch as one wave train, at the start velocity
+        unless `periods` is given, and stops it the moment the switch closes.
+        Returns the steps taken (counted on the step pin), or None if the
+        switch never closed.
+        """
+        if self.home_pin is None:
+            raise ValueError(f"No home switch fitted on the {self.name} axis.")
+        if direction is None:
+            direction = self.home_direction
+        if self.at_home():
+            return 0
+        if periods is None:
+            periods = (int(round(1e6 / self.profile.start_velocity)),) * max_steps
+        pi = self.rig.pi
+        found = threading.Event()
+
+        def closed(gpio, level, tick):
+            pi.wave_tx_stop()
+            found.set()
+
+        edge = pigpio.FALLING_EDGE if HOME_ACTIVE_LEVEL == 0 else pigpio.RISING_EDGE
+        switch = pi.callback(self.home_pin, edge, closed)
+        counter = pi.callback(self.step_pin, pigpio.RISING_EDGE)  # No function: counts edges
+        chain, wave_ids = build_step_train(pi, self.step_pin, periods)
+        taken = 0
+        try:
+            pi.write(self.dir_pin, direction)
+            self.enable()
+            self.rig.state.begin_move(self.name)
+            pi.wave_chain(chain)
+            while pi.wave_tx_busy() and not found.is_set():
+                found.wait(0.005)
+        finally:
+            switch.cancel()
+            pi.wave_tx_stop()
+            taken = counter.tally()
+            counter.cancel()
+            delete_waves(pi, wave_ids)
+            self.rig.state.end_move(self.name, taken, direction)
+            self.last_move = (taken, direction)
+            if not self.hold_after_move:
+                self.disable()
+        return taken if found.is_set() or self.at_home() else None
+
+
+class ServoAxis:
+    def __init__(self, rig, name, pin):
+        self.rig = rig
+        self.name = name
+        self.pin = pin
+        self.resources = (name,)
+        self.last_change = 0  # Pulse width change of the last move, for settling
+
+    def setup(self):
+        self.rig.pi.set_mode(self.pin, pigpio.OUTPUT)
+
+    def move(self, pulse_width):
+        previous = self.rig.state["servo"]
+        self.rig.pi.set_servo_pulsewidth(self.pin, pulse_width)
+        self.rig.state.set_servo(pulse_width)
+        # 0 means the servo was never driven, so assume a full swing
+        self.last_change = abs(pulse_width - previous) if previous else SERVO_FULL_SWING
+
+    def settle(self):
+        return self.rig.settle.wait(self.name, self.last_change)
+
+
+class Rig:
+    """
+    The pigpio connection, all three axes and the persisted axis state.
+    Creating a Rig pays the setup cost once; keep it for as long as possible.
+    """
+
+    def __init__(self, retries=20, sensors=None):
+        self.pi = connect_pigpio(retries)
+        if sensors is None:
+            sensors = default_sensors()
+        self.state = AxisState()
+        self.indexer = DeviceIndexer(self.state)
+        self.stop_requested = threading.Event()  # Ends a running campaign early
+
+        profiles = load_profiles()  # Calibrated for this rig where available
+        self.actuator = StepperAxis(self, "actuator", DIR1, STEP1, ENABLE1, profiles["actuator"],
+                                    home_pin=ACTUATOR_HOME, home_direction=1)
+        self.pcb = StepperAxis(self, "pcb", DIR2, STEP2, ENABLE2, profiles["pcb"],
+                               hold_after_move=True, microsteps=PCB_MICROSTEPS,
+                               home_pin=PCB_HOME, home_direction=1)
+        self.servo = ServoAxis(self, "servo", SERVO_PWM)
+        self.steppers = {"actuator": self.actuator, "pcb": self.pcb}
+
+        for axis in (self.actuator, self.pcb, self.servo):
+            axis.setup()
+        self.pi.set_PWM_frequency(STEP2, 500)  # 500 pulses per second for motor 2
+        self.pi.wave_clear()  # Drop waves left behind by a previous run
+        self.waves = WaveCache(self.pi)  # Waves of repeated moves stay in pigpiod
+        self.settle = SettleMonitor(self.pi, sensors)
+
+    def stop_pwm(self):
+        self.pi.set_PWM_dutycycle(STEP1, 0)  # PWM off for motor 1
+        self.pi.set_PWM_dutycycle(STEP2, 0)  # PWM off for motor 2
+
+    def close(self):
+        self.stop_pwm()
+        self.actuator.disable()  # Never leave the actuator powered, even after Ctrl-C
+        self.waves.clear()
+        self.settle.close()
+        self.pi.stop()
+
+
+def default_sensors():
+    # Settle sensors by axis, see settle_detection.SettleSensor
+    if CONTACT_SENSE is None:
+        return {}
+    return {"actuator": {"gpio": CONTACT_SENSE, "active_level": 0, "seated_direction": 0}}
+
+
+def connect_pigpio(retries):
+    # pigpiod may still be starting when the control panel launches us
+    for _ in range(retries):
+        pi = pigpio.pi()
+        if pi.connected:
+            return pi
+        sleep(0.5)
+    raise ConnectionError("Could not connect to pigpiod.")
+
+
+def run_script(sequence):
+    """
+    Runs one sequence from sequences.py as a standalone script, with the
+    command line arguments as its parameters (as the control panel calls it).
+    """
+    rig = Rig()
+    try:
+        output = sequence(rig, *sys.argv[1:])
+        if isinstance(output, types.GeneratorType):
+            for line in output:
+                print(line)
+        elif output:
+            print(output)
+    except KeyboardInterrupt:
+        print("\nCtrl-C pressed. Stopping PIGPIO and exiting...")
+    finally:
+        rig.close()
@@ -0,0 +1,187 @@
+import threading
+import math
+import pigpio
+from sequence_plans import plan_for
+from motion_telemetry import telemetry
+from sundial_motion import TEST_TRIGGER, READY_OUTPUT
+
+# Hardware trigger mode: the test equipment advances the rig itself instead
+# of an operator pressing "Next Device". When a test ends (done or fault) the
+# equipment pulls the TEST_TRIGGER line low; a pigpio callback starts the
+# first move, records the tick of that edge and wakes the waiting loop, which
+# runs the rest of the same disconnect -> index -> reconnect sequence as
+# next_device. READY_OUTPUT goes
+# high once the next device is seated and low again as soon as the next
+# trigger arrives, so the equipment knows when it may start the next test.
+#
+# Before arming, both step counts the index move can take are compiled and
+# their waves built. On arming, the plan for the next device is picked and
+# its first stepper move armed (StepperAxis.arm): direction, enable, the saved
+# `moving` state, the step callbacks and the waves are all done, so the
+# trigger callback only has to start the chain. The trigger-to-motion time of every device runs from the tick of the
+# trigger edge to the tick of the first step edge on any stepper, both from
+# pigpiod. It is reported and kept in the telemetry
+# (trigger_to_motion_seconds, trigger_to_ready_seconds).
+
+TRIGGER_EDGE = pigpio.FALLING_EDGE
+TRIGGER_GLITCH_US = 100        # Pulses shorter than this are noise on the cable
+MAX_TRIGGER_LATENCY_S = 0.005  # Trigger-to-motion times above this are flagged
+STOP_POLL_S = 0.1              # How often the wait checks for a stop request
+
+
+class TriggerInput:
+    """
+    The trigger line. Only the first edge after arm() counts; edges while the
+    rig is moving are counted in `ignored`.
+    """
+
+    def __init__(self, pi, gpio):
+        self.pi = pi
+        self.event = threading.Event()
+        self.armed = False
+        self.on_edge = None
+        self.tick = None
+        self.ignored = 0
+        pi.set_mode(gpio, pigpio.INPUT)
+        pi.set_pull_up_down(gpio, pigpio.PUD_UP)
+        pi.set_glitch_filter(gpio, TRIGGER_GLITCH_US)
+        self.callback = pi.callback(gpio, TRIGGER_EDGE, self.edge)
+
+    def edge(self, gpio, level, tick):
+        if self.armed:
+            self.armed = False
+            if self.on_edge is not None:
+                self.on_edge()
+            self.tick = tick
+            self.event.set()
+        else:
+            self.ignored += 1
+
+    def arm(self, on_edge=None):
+        # `on_edge` runs in the callback itself, before the loop wakes up
+        self.event.clear()
+        self.on_edge = on_edge
+        self.armed = True
+
+    def wait(self, timeout):
+        return self.event.wait(timeout)
+
+    def until(self, tick):
+        # Seconds from the edge to `tick` (pigpiod ticks wrap every ~72 minutes)
+        return ((tick - self.tick) & 0xFFFFFFFF) / 1e6
+
+    def since(self):
+        return self.until(self.pi.get_current_tick())
+
+    def cancel(self):
+        self.callback.cancel()
+
+
+class FirstStep:
+    """
+    The tick of the first step edge on any of the step pins, the moment the
+    rig really starts moving.
+    """
+
+    def __init__(self, pi, step_pins):
+        self.tick = None
+        self.callbacks = [pi.callback(pin, pigpio.RISING_EDGE, self.edge) for pin in step_pins]
+
+    def edge(self, gpio, level, tick):
+        if self.tick is None:
+            self.tick = tick
+
+    def cancel(self):
+        for callback in self.callbacks:
+            callback.cancel()
+
+
+def first_stepper_move(plan):
+    # The stepper move the plan starts with, the one the trigger can start
+    for move in plan.moves:
+        if not move.after and move.axis is not None and move.axis != "servo":
+            return move
+    return None
+
+
+def set_ready(pi, level):
+    if READY_OUTPUT is not None:
+        pi.write(READY_OUTPUT, level)
+
+
+def trigger_mode(rig, computed_value, total_ics, last_device=0):
+    """
+    Advances one device per trigger until `last_device` has been tested (0
+    runs until stopped with the stop query). The pins must already be seated
+    on a known device. Yields a progress line per device with its trigger
+    latency.
+    """
+    if TEST_TRIGGER is None:
+        raise ValueError("No trigger input fitted, set TEST_TRIGGER in sundial_motion.py.")
+    total_ics = int(float(total_ics))
+    last_device = int(float(last_device))
+    pi = rig.pi
+    rig.state.check_reliable("pcb")
+    device = rig.state.wrapped_device(total_ics)
+    if device is None:
+        raise ValueError("Current device unknown, set the device or home the axes first.")
+
+    # Compile the index move (and build its waves) before the first trigger.
+    # The carried step fraction makes every index either the floor or the
+    # ceiling of the exact step count, so both variants are compiled.
+    exact = float(computed_value) * rig.indexer.microsteps
+    for steps in sorted({math.floor(abs(exact)), math.ceil(abs(exact))}):
+        plan_for(rig, "index_device", steps=steps, direction=0 if exact >= 0 else 1)
+    if READY_OUTPUT is not None:
+        pi.set_mode(READY_OUTPUT, pigpio.OUTPUT)
+
+    rig.stop_requested.clear()
+    trigger = TriggerInput(pi, TEST_TRIGGER)
+    try:
+        while True:
+            axis = None
+            first_step = None
+            if device != last_device:
+                # Everything up to the first step happens here, not after the edge
+                steps, remainder = rig.indexer.plan(1, float(computed_value))
+                plan = plan_for(rig, "index_device", steps=abs(steps), direction=0 if steps >= 0 else 1)
+                first = first_stepper_move(plan)
+                if first is not None:
+                    axis = rig.steppers[first.axis]
+                    axis.arm(first.steps, first.direction, first.periods)
+                first_step = FirstStep(pi, [stepper.step_pin for stepper in rig.steppers.values()])
+            try:
+                trigger.arm(axis.fire if axis is not None else None)
+                set_ready(pi, 1)
+                yield f"PROGRESS device {device} ready, waiting for the trigger"
+                while not trigger.wait(STOP_POLL_S):
+                    if rig.stop_requested.is_set():
+                        trigger.armed = False
+                        yield f"PROGRESS device {device} stopped"
+                        return
+                set_ready(pi, 0)
+                if device == last_device:
+                    yield f"PROGRESS device {device} done"
+                    return
+                plan.run(rig)  # Its first move is already running
+            finally:
+                if first_step is not None:
+                    first_step.cancel()
+                if axis is not None:
+                    axis.disarm()  # Nothing left to undo once the move has run
+            rig.indexer.commit(remainder)
+            rig.state.shift_device(1)
+            to_ready = trigger.since()
+            # No step edge seen (should not happen): count the whole sequence
+            to_motion = trigger.until(first_step.tick) if first_step.tick is not None else to_ready
+            telemetry.record_trigger(to_motion, to_ready)
+            device = rig.state.wrapped_device(total_ics)
+            late = " (over the latency bound)" if to_motion > MAX_TRIGGER_LATENCY_S else ""
+            yield (f"PROGRESS device {device} seated, trigger to motion {to_motion * 1e3:.2f} ms{late}, "
+                   f"trigger to ready {to_ready:.3f} s")
+            if trigger.ignored:
+                yield f"PROGRESS ignored {trigger.ignored} trigger edges that came while the rig was moving"
+                trigger.ignored = 0
+    finally:
+        trigger.cancel()
+        set_ready(pi, 0)
@@ -0,0 +1,268 @@
+import os
+import sys
+import json
+import socket
+import argparse
+import subprocess
+from datetime import datetime
+from time import monotonic, sleep
+
+# Cycle-time benchmark for the operations behind the control panel buttons.
+#
+# Every operation is timed two ways: the old path (one script run per click)
+# and the motion server path. Each sample is broken down into phases:
+#   ssh           opening an exec channel and running a no-op remote command
+#   interpreter   starting python3
+#   pigpio_setup  importing pigpio, connecting to pigpiod and setting pin modes
+#   motion        time the motors were actually moving
+#   settle        settle/dwell time after moves
+#   script_body   everything a script does after setup (moves and fixed sleeps)
+#   link          time spent between the control panel and the motion server
+#   total         wall time as the operator sees it
+#
+# Runs against the simulated pigpio by default, or against a real rig with
+# --host. On a real rig the board really moves, so keep the pins clear.
+#
+#     python3 benchmark_cycle_time.py --iterations 20 --output results.json
+#     python3 benchmark_cycle_time.py --host 192.168.1.20 --compare results.json
+
+SCRIPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "RaspberryPiScripts")
+SIMULATOR_DIR = os.path.join(SCRIPT_DIR, "simulator")
+sys.path.append(SCRIPT_DIR)
+from percentiles import nearest_rank  # Same percentiles as the motion server's metrics
+MOTION_SERVER_PORT = 8765
+
+OPERATIONS = ["step_forward", "next_device", "test_first_device", "disconnect_pins", "reconnect_pins"]
+PERCENTILES = [50, 90, 99]
+
+PIGPIO_SETUP = (
+    "import pigpio; pi = pigpio.pi(); "
+    "[pi.set_mode(pin, pigpio.OUTPUT) for pin in (20, 21, 12, 22, 23, 24, 11)]; pi.stop()"
+)
+
+
+def summarize(samples):
+    summary = {
+        "count": len(samples),
+        "mean": sum(samples) / len(samples),
+        "min": min(samples),
+        "max": max(samples),
+    }
+    for pct in PERCENTILES:
+        summary[f"p{pct}"] = nearest_rank(samples, pct / 100)
+    return summary
+
+
+def read_reply(reader):
+    """
+    Reads one motion server reply. Returns (lines, remote_seconds).
+    """
+    lines = []
+    for line in reader:
+        line = line.rstrip("\n")
+        if line.startswith("OK"):
+            parts = line.split()
+            return lines, float(parts[1]) if len(parts) > 1 else None
+        if line.startswith("ERR"):
+            raise RuntimeError(line[4:])
+        lines.append(line)
+    raise ConnectionError("Motion server closed the connection")
+
+
+def parse_timings(lines):
+    # "name moving settle source" lines from the timings query
+    moving = settle = 0.0
+    for line in lines:
+        parts = line.split()
+        if len(parts) >= 3:
+            moving += float(parts[1])
+            settle += float(parts[2])
+    return moving, settle
+
+
+class SimulatedTarget:
+    """
+    Runs the scripts and the motion server locally on the simulated pigpio.
+    There is no SSH here, so the ssh phase is zero.
+    """
+
+    def __init__(self):
+        self.env = dict(os.environ, PYTHONPATH=SIMULATOR_DIR)
+        self.server = subprocess.Popen(
+            [sys.executable, "motion_server.py"], cwd=SCRIPT_DIR, env=self.env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        for _ in range(50):
+            try:
+                self.socket = socket.create_connection(("127.0.0.1", MOTION_SERVER_PORT))
+                break
+            except OSError:
+                sleep(0.1)
+        else:
+            self.close()
+            raise ConnectionError("Simulated motion server did not start")
+        self.reader = self.socket.makefile("r")
+
+    def run_python(self, *args):
+        start = monotonic()
+        subprocess.run([sys.executable] + list(args), cwd=SCRIPT_DIR, env=self.env, check=True)
+        return monotonic() - start
+
+    def ssh(self):
+        return 0.0
+
+    def run_script(self, name, value):
+        return self.run_python(f"{name}.py", str(value))
+
+    def server_command(self, command):
+        self.socket.sendall(f"{command}\n".encode())
+        return read_reply(self.reader)
+
+    def close(self):
+        self.server.terminate()
+        self.server.wait()
+
+
+class RemoteTarget:
+    """
+    Runs against a real Raspberry Pi through the same SSH layer as the
+    control panel.
+    """
+
+    def __init__(self, host):
+        from ssh_connection import RemoteConnection, REMOTE_SCRIPT_DIR
+        self.script_dir = REMOTE_SCRIPT_DIR
+        self.connection = RemoteConnection(host)
+        self.connection.connect(print)
+        if not self.connection.has_motion_server():
+            raise ConnectionError("Motion server not available on the Pi")
+
+    def run_remote(self, command):
+        start = monotonic()
+        stdin, stdout, stderr = self.connection.ssh_client.exec_command(command)
+        stdout.channel.recv_exit_status()
+        return monotonic() - start
+
+    def run_python(self, *args):
+        return self.run_remote("python3 " + " ".join(f'"{arg}"' for arg in args))
+
+    def ssh(self):
+        return self.run_remote("true")
+
+    def run_script(self, name, value):
+        return self.run_remote(f"cd {self.script_dir} && python3 {name}.py {value}")
+
+    def server_command(self, command):
+        self.connection.motion_channel.sendall(f"{command}\n".encode())
+        return read_reply(self.connection.motion_reader)
+
+    def close(self):
+        self.connection.close()
+
+
+def measure(target, operations, iterations, value, include_scripts):
+    results = {}
+    for name in operations:
+        samples = {}
+
+        def add(path, phase, seconds):
+            samples.setdefault(path, {}).setdefault(phase, []).append(seconds)
+
+        for iteration in range(iterations):
+            print(f"{name}: iteration {iteration + 1}/{iterations}", file=sys.stderr)
+            ssh = target.ssh()
+            interpreter = target.run_python("-c", "pass") - ssh
+            pigpio_setup = target.run_python("-c", PIGPIO_SETUP) - ssh - interpreter
+
+            if include_scripts:
+                total = target.run_script(name, value)
+                add("script", "total", total)
+                add("script", "ssh", ssh)
+                add("script", "interpreter", interpreter)
+                add("script", "pigpio_setup", pigpio_setup)
+                add("script", "script_body", max(total - ssh - interpreter - pigpio_setup, 0.0))
+
+            start = monotonic()
+            _, remote = target.server_command(f"{name} {value}")
+            total = monotonic() - start
+            lines, _ = target.server_command("timings")
+            moving, settle = parse_timings(lines)
+            if not lines:
+                moving = remote  # Single moves run outside a plan
+            add("server", "total", total)
+            add("server", "link", max(total - remote, 0.0))
+            add("server", "motion", moving)
+            add("server", "settle", settle)
+
+        results[name] = {
+            path: {phase: summarize(values) for phase, values in phases.items()}
+            for path, phases in samples.items()
+        }
+    return results
+
+
+def git_version():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except OSError:
+        return "unknown"
+
+
+def print_report(results, baseline=None):
+    print(f"{'operation':<20}{'path':<8}{'phase':<14}{'p50':>9}{'p90':>9}{'p99':>9}  change")
+    for name, paths in results.items():
+        for path, phases in paths.items():
+            for phase, summary in phases.items():
+                change = ""
+                try:
+                    old = baseline["results"][name][path][phase]["p50"]
+                    if old > 0:
+                        change = f"{(summary['p50'] - old) / old * 100:+.1f}%"
+                except (KeyError, TypeError):
+                    pass
+                print(
+                    f"{name:<20}{path:<8}{phase:<14}"
+                    f"{summary['p50']:>9.3f}{summary['p90']:>9.3f}{summary['p99']:>9.3f}  {change}"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark device indexing cycle times.")
+    parser.add_argument("--host", help="Raspberry Pi IP address (default: simulated pigpio)")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--operations", nargs="+", default=OPERATIONS, choices=OPERATIONS)
+    parser.add_argument("--value", type=float, default=25.0, help="Steps per device, as sent by the control panel")
+    parser.add_argument("--skip-scripts", action="store_true", help="Only time the motion server path")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Earlier results file to compare p50 values against")
+    args = parser.parse_args()
+
+    target = RemoteTarget(args.host) if args.host else SimulatedTarget()
+    try:
+        results = measure(target, args.operations, args.iterations, args.value, not args.skip_scripts)
+    finally:
+        target.close()
+
+    report = {
+        "version": git_version(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "target": args.host or "simulated",
+        "iterations": args.iterations,
+        "value": args.value,
+        "results": results,
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+    print_report(results, baseline)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import os
+import re
+import logging
+import logging.handlers
+from collections import deque
+from datetime import datetime
+from PyQt5 import QtWidgets, QtGui, QtCore
+
+LOG_DIR = os.path.join(os.path.expanduser("~"), "ProjectSundialLogs")
+LOG_FILE_BYTES = 5 * 1024 * 1024  # Size of one log file before it is rotated
+LOG_FILE_COUNT = 10  # Rotated files kept on disk
+FILE_BATCH_SIZE = 200  # Records written to the file in one go
+FILE_FLUSH_MS = 2000  # Write pending records at least this often
+
+MAX_RECORDS = 20000  # Records kept in memory for filtering
+MAX_VISIBLE_LINES = 5000  # Lines shown in the view
+
+LEVELS = ["All", "Info", "Warning", "Error"]
+DEVICE_PATTERN = re.compile(r"\bdevice (\d+)", re.IGNORECASE)
+
+
+class LogRecord:
+    __slots__ = ("time", "level", "device", "rig", "message")
+
+    def __init__(self, level, message, rig=None):
+        self.time = datetime.now()
+        self.level = level
+        self.rig = rig
+        self.message = message if rig is None else f"[{rig}] {message}"
+        match = DEVICE_PATTERN.search(message)
+        self.device = int(match.group(1)) if match else None
+
+    def text(self):
+        return f"{self.time:%H:%M:%S} {self.level:<7} {self.message}"
+
+
+def create_file_logger():
+    """
+    Logger that spills the full session history to rotating files. Records
+    are held in a MemoryHandler and written in batches.
+    """
+    logger = logging.getLogger("sundial.session")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    if not logger.handlers:
+        os.makedirs(LOG_DIR, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            os.path.join(LOG_DIR, "session.log"), maxBytes=LOG_FILE_BYTES, backupCount=LOG_FILE_COUNT
+        )
+        file_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(message)s"))
+        logger.addHandler(logging.handlers.MemoryHandler(FILE_BATCH_SIZE, logging.ERROR, file_handler))
+    return logger
+
+
+class LogPanel(QtWidgets.QWidget):
+    """
+    Log view with constant memory: the last MAX_RECORDS messages are kept in
+    a ring buffer, the view shows at most MAX_VISIBLE_LINES of them and the
+    complete history goes to a rotating file.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.records = deque(maxlen=MAX_RECORDS)
+        self.level_filter = "All"
+        self.rig_filter = None
+        self.device_filter = None
+        try:
+            self.file_logger = create_file_logger()
+        except OSError:
+            self.file_logger = None  # Keep logging to the screen if the disk is not writable
+        self.init_ui()
+
+        self.flush_timer = QtCore.QTimer(self)
+        self.flush_timer.timeout.connect(self.flush)
+        self.flush_timer.start(FILE_FLUSH_MS)
+
+    def init_ui(self):
+        layout = QtWidgets.QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        header = QtWidgets.QHBoxLayout()
+        log_label = QtWidgets.QLabel("Log")
+        log_label.setFont(QtGui.QFont("Arial", 16, QtGui.QFont.Bold))
+        header.addWidget(log_label)
+        header.addStretch()
+
+        self.level_combo = QtWidgets.QComboBox()
+        self.level_combo.addItems(LEVELS)
+        self.level_combo.currentTextChanged.connect(self.set_level_filter)
+        header.addWidget(self.level_combo)
+
+        self.rig_combo = QtWidgets.QComboBox()
+        self.rig_combo.addItem("All Rigs")
+        self.rig_combo.currentTextChanged.connect(self.set_rig_filter)
+        header.addWidget(self.rig_combo)
+
+        self.device_filter_input = QtWidgets.QLineEdit()
+        self.device_filter_input.setPlaceholderText("Device #")
+        self.device_filter_input.setFixedWidth(90)
+        self.device_filter_input.textChanged.connect(self.set_device_filter)
+        header.addWidget(self.device_filter_input)
+        layout.addLayout(header)
+
+        self.view = QtWidgets.QPlainTextEdit()
+        self.view.setReadOnly(True)
+        self.view.setMaximumBlockCount(MAX_VISIBLE_LINES)
+        self.view.setStyleSheet("background-color: #f0f0f0; padding: 10px; border-radius: 5px; font-size: 14px;")
+        layout.addWidget(self.view)
+        self.setLayout(layout)
+
+    def add(self, message, level="Info", rig=None):
+        record = LogRecord(level, message, rig)
+        self.records.append(record)
+        if self.file_logger is not None:
+            self.file_logger.log(getattr(logging, level.upper()), record.message)
+        if self.matches(record):
+            self.view.appendPlainText(record.text())
+
+    def matches(self, record):
+        if self.level_filter != "All" and record.level != self.level_filter:
+            return False
+        if self.rig_filter is not None and record.rig != self.rig_filter:
+            return False
+        if self.device_filter is not None and record.device != self.device_filter:
+            return False
+        return True
+
+    def set_level_filter(self, level):
+        self.level_filter = level
+        self.refresh()
+
+    def set_rig_filter(self, name):
+        self.rig_filter = None if name in ("", "All Rigs") else name
+        self.refresh()
+
+    def set_rigs(self, names):
+        # Keeps the rig filter choices in step with the rig list
+        current = self.rig_combo.currentText()
+        self.rig_combo.blockSignals(True)
+        self.rig_combo.clear()
+        self.rig_combo.addItems(["All Rigs"] + names)
+        if current in names:
+            self.rig_combo.setCurrentText(current)
+        self.rig_combo.blockSignals(False)
+        self.set_rig_filter(self.rig_combo.currentText())
+
+    def set_device_filter(self, text):
+        text = text.strip()
+        self.device_filter = int(text) if text.isdigit() else None
+        self.refresh()
+
+    def refresh(self):
+        # Rebuild the view from the ring buffer using the current filters
+        lines = [record.text() for record in self.records if self.matches(record)]
+        self.view.setPlainText("\n".join(lines[-MAX_VISIBLE_LINES:]))
+        self.view.moveCursor(QtGui.QTextCursor.End)
+
+    def flush(self):
+        if self.file_logger is not None:
+            for handler in self.file_logger.handlers:
+                handler.flush()
@@ -0,0 +1,141 @@
+import re
+from PyQt5 import QtWidgets, QtGui, QtCore
+
+# Shows the timing telemetry a rig's motion server exports through its
+# "metrics" query (Prometheus text format): one bar chart per histogram,
+# with the sample count, p50 and p99 underneath.
+
+SAMPLE_PATTERN = re.compile(r'^(\w+)\{(.*)\} (\S+)$')
+LABEL_PATTERN = re.compile(r'(\w+)="([^"]*)"')
+
+
+def parse_metrics(text):
+    """
+    Returns (histograms, values). histograms maps "metric label" to a dict
+    with the cumulative bucket counts and the p50/p99 gauges; values maps
+    (metric, label) to the plain counters.
+    """
+    histograms = {}
+    values = {}
+    for line in text.splitlines():
+        match = SAMPLE_PATTERN.match(line.strip())
+        if match is None:
+            continue
+        name, label_text, value = match.groups()
+        labels = dict(LABEL_PATTERN.findall(label_text))
+        bound = labels.pop("le", None)
+        label = next(iter(labels.values()), "")
+        value = float(value)
+        for suffix in ("_bucket", "_count", "_p50", "_p99"):
+            if name.endswith(suffix):
+                series = histograms.setdefault(f"{name[:-len(suffix)]} {label}", {"buckets": []})
+                if suffix == "_bucket":
+                    series["buckets"].append((bound, value))
+                else:
+                    series[suffix[1:]] = value
+                break
+        else:
+            values[(name, label)] = value
+    return histograms, values
+
+
+class HistogramChart(QtWidgets.QWidget):
+    """
+    Bar chart of one histogram, one bar per bucket.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.buckets = []
+        self.setMinimumSize(500, 250)
+
+    def set_buckets(self, buckets):
+        # Cumulative counts from the export, turned back into counts per bucket
+        self.buckets = []
+        previous = 0
+        for bound, cumulative in buckets:
+            self.buckets.append((bound, cumulative - previous))
+            previous = cumulative
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        painter.fillRect(self.rect(), QtGui.QColor("#f0f0f0"))
+        if not self.buckets:
+            painter.drawText(self.rect(), QtCore.Qt.AlignCenter, "No samples")
+            return
+        margin = 30
+        width = (self.width() - 2 * margin) / len(self.buckets)
+        height = self.height() - 2 * margin
+        highest = max(count for _, count in self.buckets) or 1
+        for index, (bound, count) in enumerate(self.buckets):
+            bar = int(height * count / highest)
+            left = int(margin + index * width)
+            painter.fillRect(left + 2, margin + height - bar, int(width) - 4, bar, QtGui.QColor("#008080"))
+            painter.drawText(left, margin + height + 4, int(width), margin - 4, QtCore.Qt.AlignHCenter, f"≤{bound}")
+            painter.drawText(left, margin + height - bar - 18, int(width), 16, QtCore.Qt.AlignHCenter, f"{count:.0f}")
+
+
+class MetricsDialog(QtWidgets.QDialog):
+    """
+    Telemetry of one rig. "Refresh" pulls the metrics again.
+    """
+
+    def __init__(self, rig_name, refresh, parent=None):
+        super().__init__(parent)
+        self.histograms = {}
+        self.values = {}
+        self.setWindowTitle(f"Motion Metrics: {rig_name}")
+        layout = QtWidgets.QVBoxLayout()
+
+        header = QtWidgets.QHBoxLayout()
+        self.series_combo = QtWidgets.QComboBox()
+        self.series_combo.currentTextChanged.connect(self.show_series)
+        header.addWidget(self.series_combo, 1)
+        refresh_button = QtWidgets.QPushButton("Refresh")
+        refresh_button.clicked.connect(refresh)
+        header.addWidget(refresh_button)
+        layout.addLayout(header)
+
+        self.chart = HistogramChart()
+        layout.addWidget(self.chart)
+        self.summary_label = QtWidgets.QLabel()
+        self.summary_label.setStyleSheet("font-size: 14px;")
+        layout.addWidget(self.summary_label)
+        self.timeouts_label = QtWidgets.QLabel()
+        self.timeouts_label.setStyleSheet("font-size: 14px;")
+        layout.addWidget(self.timeouts_label)
+        self.setLayout(layout)
+
+    def set_metrics(self, text):
+        self.histograms, self.values = parse_metrics(text)
+        current = self.series_combo.currentText()
+        self.series_combo.blockSignals(True)
+        self.series_combo.clear()
+        self.series_combo.addItems(sorted(self.histograms))
+        if current in self.histograms:
+            self.series_combo.setCurrentText(current)
+        self.series_combo.blockSignals(False)
+        self.show_series(self.series_combo.currentText())
+        # A settle sensor that keeps timing out needs looking at
+        timeouts = [
+            f"{label} {count:.0f}" for (name, label), count in sorted(self.values.items())
+            if name == "sundial_settle_timeouts_total"
+        ]
+        self.timeouts_label.setText("Settle sensor timeouts: " + (", ".join(timeouts) or "none"))
+
+    def show_series(self, key):
+        series = self.histograms.get(key)
+        if series is None:
+            self.chart.set_buckets([])
+            self.summary_label.setText("")
+            return
+        self.chart.set_buckets(series["buckets"])
+        unit = "us" if key.split()[0].endswith("_us") else "s"
+        summary = f"{series.get('count', 0):.0f} samples, p50 {series.get('p50', 0):.4g} {unit}, p99 {series.get('p99', 0):.4g} {unit}"
+        if key.startswith("sundial_step_jitter_us "):
+            axis = key.split()[1]
+            missed = self.values.get(("sundial_missed_step_deadlines_total", axis), 0)
+            steps = self.values.get(("sundial_steps_measured_total", axis), 0)
+            summary += f", {missed:.0f} of {steps:.0f} steps missed their deadline"
+        self.summary_label.setText(summary)
@@ -0,0 +1,344 @@
+import codecs
+import socket
+from datetime import datetime
+from time import sleep, monotonic
+import paramiko
+
+REMOTE_SCRIPT_DIR = "/home/team6/Desktop/stepper_testing"
+MOTION_SERVER_PORT = 8765  # Must match PORT in RaspberryPiScripts/motion_server.py
+HEARTBEAT = "PROGRESS busy"  # Must match HEARTBEAT in RaspberryPiScripts/motion_server.py
+
+USERNAME = "team6"
+PASSWORD = "team6"
+
+KEEPALIVE_INTERVAL = 5  # Seconds between SSH keepalive packets
+CONNECT_TIMEOUT = 10  # Seconds to wait for the Pi to answer
+RECONNECT_ATTEMPTS = 5
+RECONNECT_BACKOFF = 1.0  # First retry delay in seconds, doubled on every attempt
+MAX_RECONNECT_DELAY = 16.0
+READ_TIMEOUT = 15  # Seconds without a reply line (the server sends a heartbeat every 5) before the link is checked
+
+STREAM_CHUNK_SIZE = 4096  # Bytes read from a remote stream at a time
+MAX_LINE_LENGTH = 4096  # Longer lines are logged in pieces
+
+
+def timestamp():
+    return datetime.now().strftime("%H:%M:%S.%f")[:-3]
+
+
+class LineSplitter:
+    """
+    Turns chunks read from one remote stream into timestamped log lines.
+    Lines longer than MAX_LINE_LENGTH are logged in pieces so a stream
+    without newlines cannot grow the buffer without limit.
+    """
+
+    def __init__(self, report, prefix):
+        self.report = report
+        self.prefix = prefix
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.buffer = ""
+
+    def feed(self, data):
+        self.buffer += self.decoder.decode(data)
+        *lines, self.buffer = self.buffer.split("\n")
+        while len(self.buffer) >= MAX_LINE_LENGTH:
+            lines.append(self.buffer[:MAX_LINE_LENGTH])
+            self.buffer = self.buffer[MAX_LINE_LENGTH:]
+        for line in lines:
+            self.report(f"[{timestamp()}] {self.prefix}: {line.rstrip()}")
+
+    def flush(self):
+        self.buffer += self.decoder.decode(b"", final=True)
+        if self.buffer:
+            self.report(f"[{timestamp()}] {self.prefix}: {self.buffer.rstrip()}")
+        self.buffer = ""
+
+
+class ChannelReader:
+    """
+    Reads lines from a channel with a timeout. Unlike channel.makefile(), a
+    timeout never loses the part of a line already received, so reading can
+    carry on afterwards.
+    """
+
+    def __init__(self, channel, timeout=READ_TIMEOUT):
+        self.channel = channel
+        self.buffer = b""
+        channel.settimeout(timeout)
+
+    def readline(self):
+        # Raises socket.timeout if no full line arrives in time, returns "" at the end
+        while b"\n" not in self.buffer:
+            data = self.channel.recv(STREAM_CHUNK_SIZE)
+            if not data:
+                line, self.buffer = self.buffer, b""
+                return line.decode(errors="replace")
+            self.buffer += data
+        line, self.buffer = self.buffer.split(b"\n", 1)
+        return line.decode(errors="replace") + "\n"
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                return
+            yield line
+
+
+class QueryChannel:
+    """
+    A channel to the motion server for queries only, which get through while
+    the shared channel is busy with a long command. Several queries may be
+    sent on it in turn, e.g. the rate updates of one held jog button.
+    """
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.reader = ChannelReader(channel)
+
+    def send(self, query):
+        # Returns the reply lines
+        self.channel.sendall(f"{query}\n".encode())
+        lines = []
+        for line in self.reader:
+            line = line.rstrip("\n")
+            if line.startswith("OK"):
+                return lines
+            if line.startswith("ERR"):
+                raise RuntimeError(line[4:])
+            lines.append(line)
+        raise ConnectionError("Motion server closed the query channel.")
+
+    def close(self):
+        self.channel.close()
+
+
+def stream_channel(channel, report, computed_value):
+    """
+    Logs stdout and stderr of a remote command line by line while it runs.
+    Both streams are drained in the same loop, so a full stderr pipe can
+    never stall the command while stdout is still being read.
+    Returns the exit status.
+    """
+    stdout = LineSplitter(report, f"{computed_value} Output")
+    stderr = LineSplitter(report, f"{computed_value} Error")
+    while True:
+        received = False
+        if channel.recv_ready():
+            stdout.feed(channel.recv(STREAM_CHUNK_SIZE))
+            received = True
+        if channel.recv_stderr_ready():
+            stderr.feed(channel.recv_stderr(STREAM_CHUNK_SIZE))
+            received = True
+        if not received:
+            if channel.exit_status_ready() and not channel.recv_ready() and not channel.recv_stderr_ready():
+                break
+            sleep(0.01)
+    stdout.flush()
+    stderr.flush()
+    return channel.recv_exit_status()
+
+
+class RemoteConnection:
+    """
+    One managed SSH session to a Raspberry Pi. The transport sends keepalives,
+    drops are repaired with a reconnect (exponential backoff) before the next
+    command, and all commands share one persistent channel to the motion
+    server. Every command reports how long it took and how much of that was
+    spent on the link rather than on the Pi.
+    """
+
+    def __init__(self, hostname, username=USERNAME, password=PASSWORD):
+        self.hostname = hostname
+        self.username = username
+        self.password = password
+        self.ssh_client = None
+        self.motion_channel = None
+        self.motion_reader = None
+        self.link_latency = None  # Last measured round trip to the motion server (seconds)
+
+    def connect(self, report):
+        ssh_client = paramiko.SSHClient()
+        ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        ssh_client.connect(
+            self.hostname, username=self.username, password=self.password, timeout=CONNECT_TIMEOUT
+        )
+        ssh_client.get_transport().set_keepalive(KEEPALIVE_INTERVAL)
+        self.ssh_client = ssh_client
+        report(f"Connected to Raspberry Pi at {self.hostname} via SSH")
+
+        self.ssh_client.exec_command("sudo pigpiod")
+        self.start_motion_server(report)
+
+    def is_active(self):
+        if self.ssh_client is None:
+            return False
+        transport = self.ssh_client.get_transport()
+        return transport is not None and transport.is_active()
+
+    def has_motion_server(self):
+        return self.motion_channel is not None
+
+    def ensure_connected(self, report):
+        """
+        Reconnects if the session dropped since the last command and reopens
+        the motion server channel if only that was lost.
+        """
+        if self.is_active():
+            if self.motion_channel is None or self.motion_channel.closed:
+                self.close_motion_channel()
+                self.open_motion_channel(report, attempts=1)
+            return
+
+        delay = RECONNECT_BACKOFF
+        for attempt in range(1, RECONNECT_ATTEMPTS + 1):
+            report(f"Connection to {self.hostname} lost, reconnecting (attempt {attempt}/{RECONNECT_ATTEMPTS})")
+            self.close()
+            try:
+                self.connect(report)
+                return
+            except (OSError, paramiko.SSHException) as e:
+                report(f"Reconnect failed: {e}")
+            sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+        raise ConnectionError(f"Could not reconnect to {self.hostname}")
+
+    def start_motion_server(self, report):
+        """
+        Starts the motion server on the Raspberry Pi (a no-op if it is already
+        running) and opens the shared channel to it.
+        """
+        self.ssh_client.exec_command(
+            f"nohup python3 {REMOTE_SCRIPT_DIR}/motion_server.py > /tmp/motion_server.log 2>&1 &"
+        )
+        if not self.open_motion_channel(report, attempts=20):
+            report("Motion server not available, running scripts directly.")
+
+    def open_channel(self):
+        transport = self.ssh_client.get_transport()
+        return transport.open_channel("direct-tcpip", ("127.0.0.1", MOTION_SERVER_PORT), ("127.0.0.1", 0))
+
+    def open_motion_channel(self, report, attempts):
+        for _ in range(attempts):
+            try:
+                self.motion_channel = self.open_channel()
+                self.motion_reader = ChannelReader(self.motion_channel)
+                self.measure_latency()
+                report(f"Connected to motion server (round trip {self.link_latency * 1000:.1f} ms)")
+                return True
+            except (paramiko.ChannelException, OSError):
+                sleep(0.25)
+        self.motion_channel = None
+        return False
+
+    def measure_latency(self):
+        start = monotonic()
+        self.motion_channel.sendall(b"ping\n")
+        for line in self.motion_reader:
+            if line.startswith("OK") or line.startswith("ERR"):
+                break
+        self.link_latency = monotonic() - start
+
+    def close_motion_channel(self):
+        if self.motion_channel is not None:
+            self.motion_channel.close()
+        self.motion_channel = None
+        self.motion_reader = None
+
+    def close(self):
+        self.close_motion_channel()
+        if self.ssh_client is not None:
+            self.ssh_client.close()
+
+    def run_command(self, report, file_name, computed_value, arguments):
+        """
+        Runs one operation on the Pi through the motion server, or through the
+        matching script if the server is not reachable. Blocks until done.
+        """
+        self.ensure_connected(report)
+        start = monotonic()
+        if self.motion_channel is not None:
+            error, remote_time = self.send_motion_command(f"{file_name} {arguments}", report, computed_value)
+            if error:
+                report(f"[{timestamp()}] {computed_value} Error: {error}")
+        else:
+            # Motion server not reachable, fall back to running the script directly.
+            # -u keeps the script's output unbuffered so it arrives line by line
+            command = f"python3 -u {REMOTE_SCRIPT_DIR}/{file_name}.py {arguments}"
+            stdin, stdout, stderr = self.ssh_client.exec_command(command)
+            stream_channel(stdout.channel, report, computed_value)
+            remote_time = None
+
+        elapsed = monotonic() - start
+        if remote_time is None:
+            report(f"[{timestamp()}] {file_name} took {elapsed:.3f} s")
+        else:
+            report(
+                f"[{timestamp()}] {file_name} took {elapsed:.3f} s "
+                f"({remote_time:.3f} s on the Pi, {max(elapsed - remote_time, 0):.3f} s link)"
+            )
+        return elapsed
+
+    def send_motion_command(self, command, report, computed_value):
+        """
+        Sends one command to the motion server and logs each reply line as it
+        arrives. Returns (error, remote_time): the error message or an empty
+        string, and the seconds the server spent on the command.
+        """
+        error = "Lost connection to motion server."
+        try:
+            self.motion_channel.sendall(f"{command}\n".encode())
+            while True:
+                try:
+                    line = self.motion_reader.readline()
+                except socket.timeout:
+                    # A running command sends heartbeats, so silence means the
+                    # server is stuck if the SSH link itself is still up
+                    if self.is_active():
+                        error = "Motion server stopped responding."
+                    break
+                if not line:
+                    break
+                line = line.rstrip("\n")
+                if line.startswith("OK"):
+                    return "", parse_remote_time(line)
+                if line.startswith("ERR"):
+                    return line[4:], None
+                if line == HEARTBEAT:
+                    continue
+                if line.startswith("PROGRESS"):
+                    report(f"[{timestamp()}] {line[9:]}")
+                else:
+                    report(f"[{timestamp()}] {computed_value} Output: {line}")
+        except (OSError, EOFError, paramiko.SSHException):
+            pass
+        # Channel dropped: reconnect now rather than on the next command
+        self.close_motion_channel()
+        try:
+            self.ensure_connected(report)
+        except ConnectionError as e:
+            report(f"[{timestamp()}] {e}")
+        return error, None
+
+    def query_channel(self):
+        return QueryChannel(self.open_channel())
+
+    def send_query(self, query):
+        """
+        Sends one query on a channel of its own and returns the reply lines.
+        """
+        channel = self.query_channel()
+        try:
+            return channel.send(query)
+        finally:
+            channel.close()
+
+
+def parse_remote_time(line):
+    # "OK 4.512" carries the seconds the server spent on the command
+    parts = line.split()
+    try:
+        return float(parts[1])
+    except (IndexError, ValueError):
+        return None